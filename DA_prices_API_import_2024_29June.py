@@ -26,8 +26,10 @@ imb = client.query_imbalance_prices(country_code, start=start,end=end, psr_type=
 imb = imb.drop('Short', axis=1) # axis = 1 means columns, axis = 0 means delete row from df.
 
 #%% Export dataframes to .xlsx or .csv
-DA.to_excel('outfile_DA_2024_test.xlsx', index=False)
-imb.to_excel('outfile_imb_2024_test.xlsx', index=False)
+# Streamed row by row (constant memory); for long periods use entsoe_excel.py on the store
+from entsoe_excel import write_excel
+write_excel('outfile_DA_2024_test.xlsx', DA.rename('DA_price'))
+write_excel('outfile_imb_2024_test.xlsx', imb)
 #DA.to_csv('outfile_DA_2024_Jan_22Apr.csv', header=['DA_price'])
 #imb.to_csv('outfile_imb_2024_Jan_22Apr.csv', header=['imb_price'])
 
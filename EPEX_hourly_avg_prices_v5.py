@@ -3,8 +3,6 @@ import pandas as pd
 #import matplotlib.pyplot as plt
 import numpy as np
 import datetime
-from entsoe import EntsoeRawClient
-from entsoe import EntsoePandasClient
 
 # Clear console (optional)
 import os
@@ -18,37 +16,21 @@ load_dotenv()
 
 #%% set API key, date, location
 api_key = os.getenv('ENTSOE_API_KEY', 'default_api_key')
-client = EntsoePandasClient(api_key=api_key)
+# Shared keep-alive session for all queries; raw API responses are cached in cache/entsoe,
+# so re-runs over the same period do not hit the API again
+from entsoe_clients import get_client, print_connection_stats
+client = get_client(api_key)
 country_code = 'NL'  # Netherlands
 
 
 #%% Retrieve and align price data
 
-def get_da_prices_chunked(client, country_code, start, end):
-    print("Starting to retrieve Day-Ahead prices in 90-day chunks:")
-    # Create 90-day chunks
-    chunk_size = pd.Timedelta(days=90)
-    current_start = start
-    all_prices = []
-    
-    while current_start < end:
-        chunk_end = min(current_start + chunk_size, end)
-        try:
-            chunk_prices = client.query_day_ahead_prices(
-                country_code, 
-                start=current_start,
-                end=chunk_end
-            )
-            # Ensure datetime is included as a column
-            chunk_prices = chunk_prices.reset_index()  # Reset index to make datetime a column
-            all_prices.append(chunk_prices)
-            print(f"Retrieved: {current_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')}")
-        except Exception as e:
-            print(f"Error for period {current_start} to {chunk_end}: {e}")
-        
-        current_start = chunk_end
-    print("\n")
-    return pd.concat(all_prices) if all_prices else pd.DataFrame()
+from entsoe_fetch import get_da_prices_chunked, update_da_prices_csv
+from entsoe_load import load_da_prices
+from entsoe_align import weighted_mean
+
+# Number of 90-day chunks requested in parallel (stays within the ENTSO-E request budget)
+max_workers = 8
 
 
 
@@ -58,21 +40,23 @@ def get_da_prices_chunked(client, country_code, start, end):
 # Define years to analyze
 years = [2019, 2020, 2021, 2022, 2023, 2024, 2025]
 
-# Initialize an empty DataFrame to store data for all years
-all_data = []
-
 # Define the directory to save/load the data
 data_dir = '/Users/mayk/Documents/GitHub/Retrieve-Entsoe-DA-imb-prices/data'
 if not os.path.exists(data_dir):
     os.makedirs(data_dir)
 
+# Incremental update: append only the days missing since the last stored timestamp (up to the latest published auction)
+update_mode = True
+
 # Loop through each year and retrieve/load data; Data will be retrieved by Entso-e API, if not available in the data directory, else sourced locally from the data directory to save time!
 for year in years:
     file_path = os.path.join(data_dir, f'DA_prices_{year}.csv')
-    
+
+    if update_mode:
+        update_da_prices_csv(client, country_code, file_path, year, max_workers=max_workers, fast_parse=True)
+
     if os.path.exists(file_path):
-        print(f"Loading year data: {year} locally from {file_path}")
-        DA = pd.read_csv(file_path)
+        print(f"Year data for {year} available locally in {file_path}")
     else:
         print("Data not found in folder, Retrieving data for year: {year} from Entso-e API")
         start = pd.Timestamp(f'{year}-01-01 00:00:00', tz='Europe/Brussels')
@@ -83,24 +67,21 @@ for year in years:
             end = pd.Timestamp(f'{year}-12-31 23:59:59', tz='Europe/Brussels')
 
         # Retrieve Day-Ahead prices for the year
-        DA = get_da_prices_chunked(client, country_code, start, end)
+        DA = get_da_prices_chunked(client, country_code, start, end, max_workers=max_workers, fast_parse=True).reset_index()  # Reset index to make datetime a column
         DA.rename(columns={DA.columns[0]: 'time', DA.columns[1]: 'DA_price'}, inplace=True)
         
         # Save the data to a CSV file
         DA.to_csv(file_path, index=False)
         print(f"Saved data to {file_path}")
-    
-    # Add a 'year' column to distinguish data
-    DA['year'] = year
-    all_data.append(DA)
 
-# Combine all years into a single DataFrame
-df = pd.concat(all_data)
+print_connection_stats()
+
+# Load all years in parallel; timestamps are parsed by pyarrow into a tz-aware 'time' column (no to_datetime pass)
+# From 2025-10-01 DA has 15-min MTUs: 'hours' holds the time each row covers (1 or 0.25), all averages and histograms
+# below are weighted by it (hourly=True would roll the 15-min prices up to hourly means instead)
+df = load_da_prices(years, data_dir, tz='Europe/Amsterdam')
 print("df:")
 print(df)
-
-# Print the DataFrame
-df['time'] = pd.to_datetime(df['time'], utc=True).dt.tz_convert('Europe/Amsterdam')
 #df = df.drop(columns=['index'])
 
 # Extract hour
@@ -109,7 +90,7 @@ df.insert(1, 'hour', df['time'].dt.hour)
 
 
 # Calculate annual average prices
-annual_avg_prices = df.groupby('year')['DA_price'].mean().round(1).reset_index()
+annual_avg_prices = weighted_mean(df, 'year', 'DA_price').round(1).reset_index()
 annual_avg_prices = annual_avg_prices.set_index('year') # Set 'year' as index
 annual_avg_prices = annual_avg_prices.rename(columns={'DA_price': 'Annual Average'})
 print("Annual Average Prices:")
@@ -117,7 +98,7 @@ print(annual_avg_prices)
 
 
 # Calculate hourly average prices
-hourly_avg_prices = df.groupby(['year', df['time'].dt.hour])['DA_price'].mean().reset_index()
+hourly_avg_prices = weighted_mean(df, ['year', df['time'].dt.hour], 'DA_price').reset_index()
 hourly_avg_prices = hourly_avg_prices.rename(columns={'DA_hour_avg_price': 'Hourly Average Price'})
 hourly_avg_prices['DA_price'] = hourly_avg_prices['DA_price'].round(1)
 
@@ -181,7 +162,7 @@ fig = make_subplots(
 )
 
 # Add the first plot (Price over Time)
-fig.add_trace(go.Scatter(x=df['time'], y=df['DA_price'], mode='lines', name='Day-Ahead hourly price'), row=1, col=1)
+fig.add_trace(go.Scatter(x=df['time'], y=df['DA_price'], mode='lines', name='Day-Ahead price'), row=1, col=1)
 
 # Add traces for each year in hourly_avg_prices
 for column in hourly_avg_prices.columns:
@@ -199,7 +180,7 @@ print(df_2024)
 
 # Add the third plot (Average Price per Hour by month)
 # Group by month
-monthly_hourly_avg_prices = df_2024.groupby(['month', 'hour'])['DA_price'].mean().round(1).unstack()
+monthly_hourly_avg_prices = weighted_mean(df_2024, ['month', 'hour'], 'DA_price').round(1).unstack()
 print("monthly_hourly_avg_prices:")
 print(monthly_hourly_avg_prices)
 
@@ -211,8 +192,10 @@ for month in [1, 4, 12]:
 
 # Add the fourth plot (DA Price Distribution - Histogram)
 for year in years:
-    year_data = df[df['year'] == year]['DA_price']
-    fig.add_trace(go.Histogram(x=year_data, name=f'Year {year}', opacity=0.7), row=4, col=1)
+    year_data = df[df['year'] == year]
+    # Sum of hours per bin, so 15-min prices count a quarter each
+    fig.add_trace(go.Histogram(x=year_data['DA_price'], y=year_data['hours'], histfunc='sum', name=f'Year {year}',
+                               opacity=0.7), row=4, col=1)
 
 # Calculate statistics for each year
 yearly_stats = []
@@ -221,8 +204,8 @@ for year in years:
     stats = year_data.describe().round(1)
     yearly_stats.append({
         'Year': year,
-        'Count': stats['count'],
-        'Mean': stats['mean'],
+        'Hours': df.loc[df['year'] == year, 'hours'].sum(),
+        'Mean': annual_avg_prices.loc[year, 'Annual Average'] if year in annual_avg_prices.index else np.nan,
         'Std': stats['std'],
         'Min': stats['min'],
         '25%': stats['25%'],
@@ -295,7 +278,9 @@ fig3.write_image('Hourly_Avg_Prices_by_Month_2024.pdf', width=800, height=600)
 # Plot 4: Histogram of Prices
 fig4 = go.Figure()
 for year in years:
-    fig4.add_trace(go.Histogram(x=df[df['year'] == year]['DA_price'], name=f'Price Distribution {year}'))
+    year_data = df[df['year'] == year]
+    fig4.add_trace(go.Histogram(x=year_data['DA_price'], y=year_data['hours'], histfunc='sum',
+                                name=f'Price Distribution {year}'))
 fig4.update_layout(title=f'DA Price Distribution - {datetime.datetime.now().strftime("%Y-%m-%d")}',
                    xaxis_title='Electricity price €/MWh',
                    yaxis_title='Frequency [hours/year]')
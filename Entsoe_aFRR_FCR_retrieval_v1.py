@@ -18,14 +18,17 @@ load_dotenv()
 
 #%% set API key, date, location
 api_key = os.getenv('ENTSOE_API_KEY', 'default_api_key')
-client = EntsoePandasClient(api_key=api_key)
+# Both clients share one keep-alive session; raw API responses are cached in cache/entsoe,
+# so the FCR XML is kept even when FCR_prices_2024.xml is overwritten
+from entsoe_clients import get_client, get_raw_client, print_connection_stats
+client = get_client(api_key)
 country_code = 'NL'  # Netherlands
 
 #%% Retrieve FCR prices for 2024 and save to CSV using EntsoeRawClient
 start = pd.Timestamp('2024-01-01', tz='Europe/Amsterdam')
 end = pd.Timestamp('2025-01-01', tz='Europe/Amsterdam')
 
-raw_client = EntsoeRawClient(api_key=api_key)
+raw_client = get_raw_client(api_key)
 
 try:
     # Use query_fcr for FCR prices
@@ -41,4 +44,4 @@ try:
 except Exception as e:
     print(f"Error retrieving FCR prices: {e}")
 
-
+print_connection_stats()
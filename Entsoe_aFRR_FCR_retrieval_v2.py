@@ -0,0 +1,42 @@
+#%% import packages
+import pandas as pd
+import os
+import sys
+
+# Load environment variables from .env file
+from dotenv import load_dotenv
+load_dotenv()
+
+from entsoe_clients import get_raw_client, print_connection_stats
+from entsoe_balancing import DATASETS, get_balancing_prices_chunked, save_balancing, load_balancing
+
+
+#%% set API key, date, location
+api_key = os.getenv('ENTSOE_API_KEY', 'default_api_key')
+raw_client = get_raw_client(api_key)
+country_code = 'NL'  # Netherlands
+years = [2024]
+max_workers = 8  # months fetched in parallel, all within the ENTSO-E request budget
+retry_failed = '--retry-failed' in sys.argv  # only refetch chunks listed in ledger/failed_chunks.json
+
+
+#%% Retrieve FCR / aFRR capacity and aFRR energy prices into data/balancing/*.parquet
+for year in years:
+    start = pd.Timestamp(f'{year}-01-01', tz='Europe/Amsterdam')
+    end = pd.Timestamp(f'{year + 1}-01-01', tz='Europe/Amsterdam')
+    for dataset in DATASETS:
+        df = get_balancing_prices_chunked(raw_client, dataset, country_code, start, end,
+                                          max_workers=max_workers, only_failed=retry_failed,
+                                          ledger_dir=os.path.join('ledger', f'{dataset}_{country_code}_{year}'))
+        save_balancing(df, dataset, country_code)
+
+
+#%% Quick look at the stored tables
+for dataset in DATASETS:
+    df = load_balancing(dataset, country_code, years)
+    if df.empty:
+        continue
+    print(f"\n{dataset} {country_code}: {len(df)} rows")
+    print(df.groupby(['product', 'direction'], observed=True)['price'].describe())
+
+print_connection_stats()
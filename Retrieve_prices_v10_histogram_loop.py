@@ -27,12 +27,9 @@ os.system('clear')  # for Mac/Linux
 #%% import packages
 import pandas as pd
 #import matplotlib.pyplot as plt
-import numpy as np
 import datetime
-from entsoe import EntsoeRawClient
 from entsoe import EntsoePandasClient
 from dotenv import load_dotenv
-import os
 
 # Load environment variables from .env file
 load_dotenv()
@@ -46,31 +43,11 @@ country_code = 'NL'  # Netherlands
 
 #%% Retrieve and align price data
 
-def get_da_prices_chunked(client, country_code, start, end):
-    print("Starting to retrieve Day-Ahead prices in 90-day chunks:")
-    # Create 90-day chunks
-    chunk_size = pd.Timedelta(days=90)
-    current_start = start
-    all_prices = []
-    
-    while current_start < end:
-        chunk_end = min(current_start + chunk_size, end)
-        try:
-            chunk_prices = client.query_day_ahead_prices(
-                country_code, 
-                start=current_start,
-                end=chunk_end
-            )
-            # Ensure datetime is included as a column
-            chunk_prices = chunk_prices.reset_index()  # Reset index to make datetime a column
-            all_prices.append(chunk_prices)
-            print(f"Retrieved: {current_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')}")
-        except Exception as e:
-            print(f"Error for period {current_start} to {chunk_end}: {e}")
-        
-        current_start = chunk_end
-    print("\n")
-    return pd.concat(all_prices) if all_prices else pd.DataFrame()
+from entsoe_fetch import get_da_prices_chunked
+from entsoe_align import duration_hours, weighted_mean
+
+# Number of 90-day chunks requested in parallel (stays within the ENTSO-E request budget)
+max_workers = 8
 
 
 
@@ -103,22 +80,23 @@ for year in years:
         end = pd.Timestamp(f'{year}-12-31 23:59:59', tz='Europe/Brussels')
         
         # Retrieve Day-Ahead prices for the year
-        DA = get_da_prices_chunked(client, country_code, start, end)
+        DA = get_da_prices_chunked(client, country_code, start, end, max_workers=max_workers, fast_parse=True).reset_index()  # Reset index to make datetime a column
         DA.rename(columns={DA.columns[0]: 'time', DA.columns[1]: 'DA_price'}, inplace=True)
         
         # Save the data to a CSV file
         DA.to_csv(file_path, index=False)
         print(f"Saved data to {file_path}")
     
-    # Add a 'year' column to distinguish data
+    # Add a 'year' column to distinguish data, and the hours each price covers (0.25 for 15-min MTUs)
     DA['year'] = year
+    DA['hours'] = duration_hours(pd.to_datetime(DA['time'], utc=True))
     all_data.append(DA)
 
 # Combine all years into a single DataFrame
 combined_data = pd.concat(all_data)
 
 # Calculate annual average prices
-annual_avg_prices = combined_data.groupby('year')['DA_price'].mean().reset_index()
+annual_avg_prices = weighted_mean(combined_data, 'year', 'DA_price').reset_index()
 annual_avg_prices = annual_avg_prices.rename(columns={'DA_price': 'Annual Average Price'})
 
 # Merge annual average prices into the combined data
@@ -128,14 +106,18 @@ combined_data = pd.merge(combined_data, annual_avg_prices, on='year', how='left'
 import plotly.express as px
 
 
-# Create a histogram with different colors for each year and fixed bin width
+# Create a histogram with different colors for each year and fixed bin width; bins sum the hours, so the
+# y-axis stays hours/year for years with 15-min prices
 fig = px.histogram(
     combined_data,
     x="DA_price",
+    y="hours",
+    histfunc="sum",
     color="year",
     opacity=0.5,  # Set opacity for overlapping histograms
     title=f"Histogram of Day-Ahead Prices for Multiple Years ({country_code})",
-    labels={"DA_price": "Day-Ahead Price (EUR/MWh)", "year": "Year", "Annual Average Price": "Annual Average Price"},
+    labels={"DA_price": "Day-Ahead Price (EUR/MWh)", "year": "Year", "Annual Average Price": "Annual Average Price",
+            "hours": "Hours"},
     barmode="overlay",  # Overlay histograms
     hover_data=['Annual Average Price'],  # Show annual average price on hover
     nbins=None,  # Let Plotly calculate the number of bins
@@ -27,19 +27,17 @@ os.system('clear')  # for Mac/Linux
 #%% import packages
 import pandas as pd
 #import matplotlib.pyplot as plt
-import numpy as np
-import datetime
-from entsoe import EntsoeRawClient
-from entsoe import EntsoePandasClient
 from dotenv import load_dotenv
-import os
 
 # Load environment variables from .env file
 load_dotenv()
 
 #%% set API key, date, location
 api_key = os.getenv('ENTSOE_API_KEY', 'default_api_key')
-client = EntsoePandasClient(api_key=api_key)
+# Shared keep-alive session for all queries; raw API responses are cached in cache/entsoe,
+# so re-runs over the same period do not hit the API again
+from entsoe_clients import get_client, print_connection_stats
+client = get_client(api_key)
 
 print("Script started to retrieve Day-Ahead and Imbalance prices using Python and Entso-e API script")
 start = pd.Timestamp('2024-01-01 00:00:00', tz='Europe/Brussels')
@@ -50,73 +48,71 @@ country_code = 'NL'  # Netherlands, #country_code_from = 'FR'  # France, #countr
 # type_marketagreement_type = 'A01'
 # contract_marketagreement_type = "A01"
 
-#%%  Create datetime arrays first
-datetime_hourly = pd.date_range(start=start, end=end, freq='h'    , tz='Europe/Brussels')  # Using 'h' instead of 'H'
+#%% Retrieve and align price data
 
-# Print the first few entries to verify
-print("\n datetime_hourly first rows:")
-print(datetime_hourly[:5])
-print("\n datetime_hourly last 5 rows:")
-print(datetime_hourly[-5:])
-print("\n")
+from entsoe_fetch import get_da_prices_chunked, get_imbalance_prices_chunked
+from entsoe_store import append_log, compact, find_gaps
+# Prices are placed on a UTC grid by their own timestamps (DST-safe); missing points stay NaN and are reported
+from entsoe_align import align_frame, duration_hours, missing_periods, resolution_runs, to_epoch_seconds
 
+# Number of 90-day chunks requested in parallel (stays within the ENTSO-E request budget)
+max_workers = 8
 
-datetime_15min  = pd.date_range(start=start, end=end, freq='15min', tz='Europe/Brussels')  # Using '15min' instead of '15T'
+# Chunks that still fail after all retries are listed in ledger/failed_chunks.json;
+# run the script again with --retry-failed to refetch only those (the rest comes from the ledger dirs)
+import sys
+retry_failed = '--retry-failed' in sys.argv
+period_str = f"{country_code}_{start.strftime('%Y%m%d')}_to_{end.strftime('%Y%m%d')}"
+# The full-period outfile_*.csv dumps are only written with --csv; the data goes into data/store
+export_csv = '--csv' in sys.argv
 
-print(datetime_15min[:5])
+# Every fetched chunk is appended to the store's ingest log as soon as it arrives (one small batch per chunk)
+def append_DA_chunk(chunk_start, chunk_end, chunk):
+    append_log(chunk.rename('DA_price'), 'DA', country_code)
 
-#%% Retrieve and align price data
-
-def get_da_prices_chunked(client, country_code, start, end):
-    print("Starting to retrieve Day-Ahead prices in 90-day chunks:")
-    # Create 90-day chunks
-    chunk_size = pd.Timedelta(days=90)
-    current_start = start
-    all_prices = []
-    
-    while current_start < end:
-        chunk_end = min(current_start + chunk_size, end)
-        try:
-            chunk_prices = client.query_day_ahead_prices(
-                country_code, 
-                start=current_start,
-                end=chunk_end
-            )
-            all_prices.append(chunk_prices)
-            print(f"Retrieved: {current_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')}")
-        except Exception as e:
-            print(f"Error for period {current_start} to {chunk_end}: {e}")
-        
-        current_start = chunk_end
-    print("\n")
-    return pd.concat(all_prices) if all_prices else pd.DataFrame()
+def append_imb_chunk(chunk_start, chunk_end, chunk):
+    append_log(chunk[['Long', 'Short']], 'imbalance', country_code)
 
 # Replace original DA query with:
-DA = get_da_prices_chunked(client, country_code, start, end)
+DA, DA_failed = get_da_prices_chunked(client, country_code, start, end, max_workers=max_workers, fast_parse=True,
+                                      ledger_dir=os.path.join('ledger', f'DA_{period_str}'),
+                                      only_failed=retry_failed, return_failed=True, on_chunk=append_DA_chunk)
+if DA_failed:
+    print(f"WARNING: {len(DA_failed)} DA chunks missing: {[(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')) for s, e in DA_failed]}")
+if len(DA) == 0:
+    sys.exit(f"No DA prices retrieved for {country_code} {start.date()} to {end.date()}; run again with --retry-failed")
 # Export to CSV for verification
 #DA.to_csv('outfile_DA_2024_direct.csv', header=['DA_price'])
 
 
-# Ensure lengths match before assigning index
-if len(DA) == len(datetime_hourly):
-    DA.index = datetime_hourly
-else:
-    print(f"Length mismatch: DA has {len(DA)} elements, datetime_hourly has {int(len(datetime_hourly))} elements \n")
-    DA = DA.iloc[:len(datetime_hourly)]
-    DA.index = datetime_hourly[:len(DA)]
-
-
-print("Starting to retrieve imbalance prices in 15-min chunks:")
-imb = client.query_imbalance_prices(country_code, start=start, end=end, psr_type=None)
-imb.index = datetime_15min[:len(imb)]
+DA_raw = DA
+# DA is PT60M before the 15-min MTU go-live and PT15M after: align on the finest resolution in the period
+DA_step = min(step for _, _, step in resolution_runs(to_epoch_seconds(DA_raw.index)))
+DA_aligned, DA_present = align_frame({'DA_price': DA_raw}, start, end, step=DA_step, tz='Europe/Brussels')
+DA = DA_aligned['DA_price']
+for gap_start, gap_end in missing_periods(DA_present['DA_price']):
+    print(f"WARNING: DA prices missing from {gap_start} to {gap_end}")
+
+
+# Imbalance prices in 30-day chunks; finished chunks are kept in the ledger dir so an interrupted run resumes
+imb, imb_failed = get_imbalance_prices_chunked(client, country_code, start, end, max_workers=max_workers,
+                                               ledger_dir=os.path.join('ledger', f'imb_{period_str}'),
+                                               only_failed=retry_failed, return_failed=True, on_chunk=append_imb_chunk)
+if imb_failed:
+    print(f"WARNING: {len(imb_failed)} imbalance chunks missing: {[(s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')) for s, e in imb_failed]}")
+if len(imb) == 0:
+    sys.exit(f"No imbalance prices retrieved for {country_code} {start.date()} to {end.date()}; run again with --retry-failed")
+imb, imb_present = align_frame({'Long': imb['Long'], 'Short': imb['Short']}, start, end, step=900, tz='Europe/Brussels')
+for gap_start, gap_end in missing_periods(imb_present.all(axis=1)):
+    print(f"WARNING: imbalance prices missing from {gap_start} to {gap_end}")
 #imb =  imb.drop('Short', axis=1)
 #print("\n imbalance price is:")
 #print(imb[:5])
 
 
 #%% Process to 15-min resolution
-DA_15min = pd.DataFrame(index=datetime_15min)
-DA_15min['DA_price'] = DA.reindex(index=datetime_15min, method='ffill')
+# Every hourly DA price fills its own four quarter-hours (no forward fill across missing hours)
+DA_15min, DA_15min_present = align_frame({'DA_price': DA_raw}, start, end, step=900, tz='Europe/Brussels')
 
 
 
@@ -164,10 +160,26 @@ start_date_str = start.strftime('%Y%m%d')
 end_date_str = end.strftime('%Y%m%d')
 
 # Export with date-based filenames
-DA_combined.to_csv(f'outfile_DA_60min_{country_code}_{start_date_str}_to_{end_date_str}.csv', index=False)
-imb_combined.to_csv(f'outfile_imb_15min_{country_code}_{start_date_str}_to_{end_date_str}.csv')
-print(f".csv files written for period {start_date_str} to {end_date_str}")
+if export_csv:
+    DA_combined.to_csv(f'outfile_DA_60min_{country_code}_{start_date_str}_to_{end_date_str}.csv', index=False)
+    imb_combined.to_csv(f'outfile_imb_15min_{country_code}_{start_date_str}_to_{end_date_str}.csv')
+    print(f".csv files written for period {start_date_str} to {end_date_str}")
+
+# Merge this run's log batches into the monthly partitions of data/store (only the touched months are rewritten)
+compact('DA', country_code)
+compact('imbalance', country_code)
+print("Prices written to data/store")
+
+# Completeness check from the store manifests (no data is loaded)
+for dataset in ['DA', 'imbalance']:
+    gaps = find_gaps(dataset, country_code, start, end)
+    for gap_start, gap_end in gaps:
+        print(f"WARNING: {dataset} {country_code} missing {gap_start} to {gap_end}")
+    if not gaps:
+        print(f"{dataset} {country_code} complete for {start.date()} to {end.date()}")
 
 #%%
-print(f"Length mismatch: DA has {len(DA_combined)} elements, imb_combined has {len(imb_combined)} = {len(imb_combined)/4}elements")
+print(f"Rows: DA has {len(DA_combined)} rows = {duration_hours(DA_combined['datetime']).sum():g} hours, "
+      f"imb_combined has {len(imb_combined)} rows = {duration_hours(imb_combined.index).sum():g} hours")
+print_connection_stats()
 print("Script finished")
\ No newline at end of file
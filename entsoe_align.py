@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Place price series on a UTC time grid by their own timestamps, with missing-data masks.
+
+The old scripts built a local pd.date_range and assigned it positionally
+(DA.iloc[:len(datetime_hourly)], imb.index = datetime_15min[:len(imb)]),
+which shifts every later value when one hour or one chunk is missing, and
+gets DST days wrong. Here every point goes to slot (epoch - origin) // step
+of a UTC grid in one vectorised pass; nothing is matched by position.
+
+Each point covers its own resolution (taken from the spacing of the series,
+so hourly DA before and 15-min DA after the SDAC go-live both work, and a
+missing hour stays missing instead of being forward filled):
+  - coarser than the grid (hourly DA on a 15-min grid): the value fills every slot it covers
+  - finer than the grid (15-min DA on an hourly grid): the slot gets the time-weighted mean
+A slot counts as present only when it is fully covered; the mask says which
+slots are, and missing_periods() lists the gaps.
+
+The same durations make aggregation resolution-agnostic: duration_hours()
+gives every row its weight in hours (1 for PT60M, 0.25 for PT15M), so
+weighted_mean() and histograms of "hours per year" stay correct across the
+switch, and rollup() gives hourly means of any series on the fly.
+
+The resolution helpers (to_epoch_seconds, resolution_runs, run_steps,
+describe_resolutions) live here rather than in entsoe_store, so fetch and
+analysis scripts can use them with only numpy and pandas installed.
+
+Usage:
+    from entsoe_align import align_frame, missing_periods
+    aligned, present = align_frame({'DA_price': DA, 'Long': imb['Long']}, start, end, step=900)
+    for gap_start, gap_end in missing_periods(present['DA_price']):
+        print(f"DA missing {gap_start} to {gap_end}")
+
+    DA_hourly = rollup(DA)                                  # 15-min DA -> hourly means, hourly DA unchanged
+    df['hours'] = duration_hours(df['time'])
+    weighted_mean(df, [df['year'], df['time'].dt.hour], 'DA_price')
+@author: Mayk Thewessen
+"""
+
+import numpy as np
+import pandas as pd
+
+from entsoe_parse import RESOLUTION_SECONDS
+
+
+DEFAULT_TZ = 'Europe/Amsterdam'
+
+
+#%% Resolutions
+
+def to_epoch_seconds(index):
+    """int64 UTC epoch seconds for a tz-aware DatetimeIndex (naive timestamps are taken as UTC)."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return index.tz_convert('UTC').as_unit('s').asi8
+
+
+def to_index(epoch, tz=DEFAULT_TZ):
+    return pd.DatetimeIndex(pd.to_datetime(epoch, unit='s', utc=True)).tz_convert(tz).rename('time')
+
+
+def time_segments(timestamps):
+    """Split sorted UTC epoch seconds into [origin, step, length] runs of constant spacing."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) == 0:
+        return []
+    diffs = np.diff(timestamps)
+    segments, first = [], 0
+    while first < len(timestamps):
+        if first == len(timestamps) - 1:
+            step = segments[-1][1] if segments else 0
+            segments.append([int(timestamps[first]), step, 1])
+            break
+        step = int(diffs[first])
+        other = np.flatnonzero(diffs[first:] != step)
+        length = (int(other[0]) if len(other) else len(diffs) - first) + 1
+        segments.append([int(timestamps[first]), step, length])
+        first += length
+    return segments
+
+
+def resolution_runs(timestamps, step=None):
+    """[start, end, step] runs of one resolution (UTC epoch seconds) in sorted timestamps.
+
+    Built from the segments of constant spacing (time_segments).
+    Segments with the same step merge across gaps; a segment of fewer than
+    three rows is spacing around a gap, not a resolution, and takes the step
+    of the run before it (or after it, or step). The exception is a short
+    coarser tail cut off by a finer run, e.g. the last hourly row before the
+    15-min go-live: it keeps its own step. A change of resolution, such as the
+    SDAC switch from PT60M to PT15M, starts the new run at the first row that
+    is cut short by the finer one.
+    """
+    segments = time_segments(timestamps)
+    # Step of the next segment of three or more rows, for every segment
+    following, next_step = [None] * len(segments), None
+    for i in range(len(segments) - 1, -1, -1):
+        following[i] = next_step
+        if segments[i][2] >= 3:
+            next_step = segments[i][1]
+    resolutions = [segment_step for _, segment_step, length in segments if length >= 3]
+    current = resolutions[0] if resolutions else step or next((s for _, s, _ in segments if s), 3600)
+    runs = []
+    for i, (origin, segment_step, length) in enumerate(segments):
+        last = origin + segment_step * (length - 1)
+        if length >= 3:
+            current = segment_step
+        elif (following[i] and segment_step > following[i] and segment_step % following[i] == 0
+              and last + segment_step > segments[i + 1][0] and (not runs or runs[-1][2] == segment_step)):
+            current = segment_step
+        if runs and runs[-1][1] > origin:
+            # The last row of the previous run only lasts until this one: it belongs to this run
+            runs[-1][1] = origin = runs[-1][1] - runs[-1][2]
+            if runs[-1][1] <= runs[-1][0]:
+                runs.pop()
+        if runs and runs[-1][2] == current:
+            runs[-1][1] = last + current
+        else:
+            runs.append([int(origin), int(last + current), int(current)])
+    return runs
+
+
+def run_steps(timestamps, runs):
+    """Step (s) of the resolution run each of the sorted timestamps falls in."""
+    starts = np.array([run[0] for run in runs], dtype=np.int64)
+    steps = np.array([run[2] for run in runs], dtype=np.int64)
+    return steps[np.maximum(np.searchsorted(starts, timestamps, side='right') - 1, 0)]
+
+
+def resolution_name(step):
+    """ISO 8601 name of a resolution in seconds as ENTSO-E writes it ('PT15M'), else e.g. '1800s'."""
+    for name, seconds in RESOLUTION_SECONDS.items():
+        if seconds == step:
+            return name
+    return f'{step}s'
+
+
+def describe_resolutions(runs, tz=DEFAULT_TZ):
+    """'PT60M 2019-01-01 00:00 - 2025-10-01 00:00, PT15M 2025-10-01 00:00 - ...' for printing."""
+    return ', '.join(f"{resolution_name(step)} {to_index([start], tz)[0]:%Y-%m-%d %H:%M} - "
+                     f"{to_index([end], tz)[0]:%Y-%m-%d %H:%M}" for start, end, step in runs)
+
+
+#%% Grid alignment
+
+def _epoch(value):
+    value = pd.Timestamp(value)
+    if value.tz is None:
+        raise ValueError(f"{value} has no time zone; pass tz-aware start/end")
+    return int(value.timestamp())
+
+
+def utc_grid(start, end, step):
+    """UTC epoch seconds of the slots in [start, end) every step seconds."""
+    return np.arange(_epoch(start), _epoch(end), step, dtype=np.int64)
+
+
+def point_durations(epoch, resolution=None):
+    """Seconds covered by each point of sorted epoch seconds: the step of its resolution run, cut at the next point.
+
+    Runs come from resolution_runs, so points around a gap keep the
+    resolution of their run. resolution (s) overrides the run step.
+    """
+    epoch = np.asarray(epoch, dtype=np.int64)
+    if resolution is not None:
+        durations = np.full(len(epoch), resolution, dtype=np.int64)
+    elif len(epoch):
+        durations = run_steps(epoch, resolution_runs(epoch))
+    else:
+        durations = np.empty(0, dtype=np.int64)
+    # A point never covers the next one (e.g. the last hourly DA point before the 15-min go-live)
+    durations[:-1] = np.minimum(durations[:-1], np.diff(epoch))
+    return durations
+
+
+def align_to_grid(epoch, values, origin, step, length, resolution=None):
+    """Put (epoch, value) points onto the grid origin + i * step, i < length.
+
+    Returns (aligned float64 array, present bool array, number of points that
+    do not start on the grid). Slots without complete coverage are not
+    present; slots without any data are NaN.
+    """
+    epoch = np.asarray(epoch, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(epoch, kind='stable')
+    epoch, values = epoch[order], values[order]
+    durations = point_durations(epoch, resolution)
+    if len(durations) and (durations <= 0).any():
+        # Single point or duplicated timestamps: fall back to one grid step
+        durations = np.where(durations <= 0, step, durations)
+    valid = ~np.isnan(values)
+    epoch, values, durations = epoch[valid], values[valid], durations[valid]
+
+    offset = epoch - origin
+    off_grid = int(np.count_nonzero((offset % step != 0) & (durations >= step)))
+    slots_per_point = np.maximum(durations // step, 1)
+    weights = np.minimum(durations, step).astype(np.float64)
+    slot = np.repeat(offset // step, slots_per_point)
+    slot += np.arange(len(slot)) - np.repeat(np.cumsum(slots_per_point) - slots_per_point, slots_per_point)
+    weights = np.repeat(weights, slots_per_point)
+    values = np.repeat(values, slots_per_point)
+
+    inside = (slot >= 0) & (slot < length)
+    slot, weights, values = slot[inside], weights[inside], values[inside]
+    covered = np.bincount(slot, weights=weights, minlength=length)
+    total = np.bincount(slot, weights=weights * values, minlength=length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        aligned = np.where(covered > 0, total / covered, np.nan)
+    return aligned, covered >= step, off_grid
+
+
+def align_frame(series, start, end, step, tz=DEFAULT_TZ, resolution=None):
+    """Align several Series (tz-aware DatetimeIndex) onto one UTC grid over [start, end).
+
+    series: {column name: Series}. Returns (aligned, present): a DataFrame of
+    values and a DataFrame of bool masks, both indexed by the grid in tz.
+    resolution: seconds per point for all series, or {name: seconds}; default inferred.
+    """
+    grid = utc_grid(start, end, step)
+    index = pd.DatetimeIndex(pd.to_datetime(grid, unit='s', utc=True)).tz_convert(tz).rename('time')
+    aligned, present = {}, {}
+    for name, s in series.items():
+        s = s[~s.index.duplicated(keep='last')]
+        own_resolution = resolution.get(name) if isinstance(resolution, dict) else resolution
+        aligned[name], present[name], off_grid = align_to_grid(
+            to_epoch_seconds(s.index), s.to_numpy(dtype=np.float64, na_value=np.nan),
+            int(grid[0]) if len(grid) else _epoch(start), step, len(grid), own_resolution)
+        if off_grid:
+            print(f"{name}: {off_grid} points do not start on the {step} s grid")
+    return pd.DataFrame(aligned, index=index), pd.DataFrame(present, index=index)
+
+
+def missing_periods(present):
+    """(start, end) of each run of missing slots in a bool mask Series indexed by a regular grid."""
+    missing = ~np.asarray(present, dtype=bool)
+    if not missing.any():
+        return []
+    index = present.index
+    step = index[1] - index[0] if len(index) > 1 else pd.Timedelta(0)
+    edges = np.diff(np.r_[0, missing.astype(np.int8), 0])
+    firsts, lasts = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return [(index[first], index[last - 1] + step) for first, last in zip(firsts, lasts)]
+
+
+#%% Resolution-agnostic aggregation
+
+def duration_hours(times):
+    """Hours covered by each row (1.0 for PT60M, 0.25 for PT15M) of a time Series or DatetimeIndex.
+
+    The rows may come in any order; durations are computed on the sorted
+    unique timestamps and returned in the input order. A repeated timestamp
+    (e.g. a shared chunk boundary) counts once, at its last row.
+    """
+    epoch = to_epoch_seconds(pd.DatetimeIndex(times))
+    unique, position = np.unique(epoch, return_inverse=True)
+    hours = (point_durations(unique) / 3600).astype(np.float32)[position]
+    hours[pd.Index(epoch).duplicated(keep='last')] = 0
+    return pd.Series(hours, index=times.index, name='hours') if isinstance(times, pd.Series) else hours
+
+
+def weighted_mean(df, by, value, weight='hours'):
+    """Time-weighted mean of df[value] per group: rows count by the hours they cover, NaN prices not at all.
+
+    by: a column name, a Series or a list of them, as for DataFrame.groupby.
+    """
+    keys = [df[key] if isinstance(key, str) else key for key in (by if isinstance(by, list) else [by])]
+    weights = df[weight].where(df[value].notna(), 0).astype(np.float64)
+    sums = pd.DataFrame({'weighted': df[value].astype(np.float64) * weights, 'hours': weights}).groupby(keys).sum()
+    return (sums['weighted'] / sums['hours']).rename(value)
+
+
+def rollup(series, step=3600, complete_only=True):
+    """Time-weighted means of a Series (any resolution, tz-aware index) per UTC step, e.g. hourly.
+
+    Slots already at the target resolution pass through unchanged. With
+    complete_only, slots that are not fully covered are dropped instead of
+    averaged over the part that is there.
+    """
+    series = series[~series.index.duplicated(keep='last')].sort_index()
+    if len(series) == 0:
+        return series
+    epoch = to_epoch_seconds(series.index)
+    origin = int(epoch[0]) // step * step
+    length = (int(epoch[-1] + point_durations(epoch)[-1]) - origin + step - 1) // step
+    aligned, present, _ = align_to_grid(epoch, series.to_numpy(dtype=np.float64, na_value=np.nan), origin, step, length)
+    keep = present if complete_only else ~np.isnan(aligned)
+    index = pd.DatetimeIndex(pd.to_datetime(origin + step * np.flatnonzero(keep), unit='s', utc=True))
+    return pd.Series(aligned[keep], index=index.tz_convert(series.index.tz or 'UTC').rename(series.index.name),
+                     name=series.name)
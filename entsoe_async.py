@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio retrieval engine for a whole job matrix of zones x years x document types.
+
+All jobs are split into chunks and run on one event loop. Every host gets its
+own concurrency limit (semaphore) and all requests share one request-per-minute
+budget, so e.g. NL/BE/DE_LU/FR x 2019-2025 x DA/imbalance/FCR finishes in about
+the time of the slowest chunks instead of the sum of all requests.
+
+The entsoe-py client is synchronous, so each request runs in a worker thread
+while the event loop schedules and limits them.
+
+Usage:
+    python entsoe_async.py --zones NL BE DE_LU FR --years 2019-2025 --types DA imbalance FCR
+@author: Mayk Thewessen
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pandas as pd
+from entsoe.exceptions import NoMatchingDataError
+
+from entsoe_fetch import DEFAULT_BACKOFF, DEFAULT_FAILED_LEDGER, DEFAULT_RETRIES, DOCUMENT_TYPES, ENTSOE_REQUESTS_PER_MINUTE
+from entsoe_fetch import FailedChunkLedger, call_with_retries, get_default_planner, is_transient, make_chunks
+from entsoe_fetch import query_document, timed_query
+
+
+DEFAULT_HOST = urlparse(os.getenv("ENTSOE_ENDPOINT_URL") or "https://web-api.tp.entsoe.eu/api").netloc
+DEFAULT_HOST_CONCURRENCY = 8
+
+
+class AsyncRateLimiter:
+    """asyncio version of entsoe_fetch.RateLimiter (sliding 60 s window)."""
+
+    def __init__(self, requests_per_minute=ENTSOE_REQUESTS_PER_MINUTE, period=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.period = period
+        self._calls = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.requests_per_minute:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.requests_per_minute:
+                    self._calls.append(now)
+                    return
+                await asyncio.sleep(self.period - (now - self._calls[0]))
+
+    def for_thread(self, loop):
+        # Blocking acquire() for worker threads (e.g. call_with_retries), so retries share this budget too
+        return SimpleNamespace(acquire=lambda: asyncio.run_coroutine_threadsafe(self.acquire(), loop).result())
+
+
+def build_job_matrix(zones, years, document_types=DOCUMENT_TYPES, tz='Europe/Brussels'):
+    """Return one job dict per (zone, year, document type)."""
+    jobs = []
+    for zone in zones:
+        for year in years:
+            for document_type in document_types:
+                jobs.append({
+                    'zone': zone,
+                    'year': year,
+                    'document_type': document_type,
+                    'start': pd.Timestamp(f'{year}-01-01 00:00:00', tz=tz),
+                    'end': pd.Timestamp(f'{year + 1}-01-01 00:00:00', tz=tz),
+                    'host': DEFAULT_HOST,
+                })
+    return jobs
+
+
+async def run_jobs_async(client, jobs, chunk_size=None, host_limits=None,
+                         requests_per_minute=ENTSOE_REQUESTS_PER_MINUTE, planner=None,
+                         retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, failed_ledger_path=DEFAULT_FAILED_LEDGER):
+    """Fetch all jobs concurrently and return {(zone, year, document_type): DataFrame}.
+
+    host_limits maps host -> max requests in flight; hosts not listed get
+    DEFAULT_HOST_CONCURRENCY. Every chunk goes through call_with_retries (429
+    backoff, transient retries); chunks that still fail are left out and
+    recorded in the failed-chunk ledger under e.g. 'DA NL', like fetch_chunked.
+    Without chunk_size every document type is split with the window of the
+    shared ChunkPlanner, which also records the measured requests.
+    """
+    planner = planner if planner is not None else get_default_planner()
+    host_limits = dict(host_limits or {})
+    limits = {}
+    for job in jobs:
+        host = job.get('host', DEFAULT_HOST)
+        limits[host] = host_limits.get(host, DEFAULT_HOST_CONCURRENCY)
+    semaphores = {host: asyncio.Semaphore(limit) for host, limit in limits.items()}
+    rate_limiter = AsyncRateLimiter(requests_per_minute)
+    failed_ledger = FailedChunkLedger(failed_ledger_path) if failed_ledger_path else None
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max(1, sum(limits.values())))
+    thread_limiter = rate_limiter.for_thread(loop)
+    failed_chunks = []
+
+    async def fetch_chunk(job, chunk_start, chunk_end):
+        label = f"{job['document_type']} {job['zone']}"
+        async with semaphores[job.get('host', DEFAULT_HOST)]:
+            try:
+                result = await loop.run_in_executor(executor, call_with_retries, job['query'], chunk_start,
+                                                    chunk_end, thread_limiter, retries, backoff)
+            except NoMatchingDataError:
+                print(f"No data for {label} {chunk_start} to {chunk_end}")
+                if failed_ledger is not None:
+                    failed_ledger.resolve(label, chunk_start, chunk_end)
+                return None
+            except Exception as e:
+                reason = f"gave up after {retries} retries" if is_transient(e) else "permanent error, not retried"
+                print(f"Error for {label} {chunk_start} to {chunk_end} ({reason}): {e}")
+                failed_chunks.append((label, chunk_start, chunk_end))
+                if failed_ledger is not None:
+                    failed_ledger.record(label, chunk_start, chunk_end, e)
+                return None
+        if failed_ledger is not None:
+            failed_ledger.resolve(label, chunk_start, chunk_end)
+        print(f"Retrieved {label}: {chunk_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')}")
+        return result
+
+    async def fetch_job(job):
+        document_type = job['document_type']
+
+        def query(chunk_start, chunk_end):
+            return query_document(client, document_type, job['zone'], chunk_start, chunk_end)
+
+        job = dict(job, query=timed_query(query, planner, document_type))
+        window = chunk_size if chunk_size is not None else planner.chunk_size(document_type)
+        chunks = make_chunks(job['start'], job['end'], window)
+        # gather keeps the chunk order, so every job comes back in time order
+        parts = await asyncio.gather(*(fetch_chunk(job, s, e) for s, e in chunks))
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return pd.DataFrame()
+        # entsoe-py pads every chunk query and returns the end row too, so neighbouring chunks overlap
+        df = pd.concat(parts)
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        return df[(df.index >= job['start']) & (df.index < job['end'])]
+
+    try:
+        frames = await asyncio.gather(*(fetch_job(job) for job in jobs))
+    finally:
+        executor.shutdown(wait=False)
+        planner.save()
+    if failed_chunks:
+        print(f"{len(failed_chunks)} chunks failed"
+              + (f" and were written to {failed_ledger_path}" if failed_ledger is not None else ""))
+    return {(job['zone'], job['year'], job['document_type']): frame for job, frame in zip(jobs, frames)}
+
+
+def run_jobs(client, jobs, **kwargs):
+    """Synchronous entry point for scripts: runs run_jobs_async on a fresh event loop."""
+    return asyncio.run(run_jobs_async(client, jobs, **kwargs))
+
+
+def parse_years(text):
+    # '2019-2025' -> [2019, ..., 2025]; '2024' -> [2024]
+    if '-' in text:
+        first, last = text.split('-')
+        return list(range(int(first), int(last) + 1))
+    return [int(text)]
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    from entsoe_clients import get_client
+
+    parser = argparse.ArgumentParser(description="Fetch a zones x years x document types matrix from ENTSO-E")
+    parser.add_argument('--zones', nargs='+', default=['NL'])
+    parser.add_argument('--years', default='2019-2025')
+    parser.add_argument('--types', nargs='+', default=list(DOCUMENT_TYPES), choices=DOCUMENT_TYPES)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_HOST_CONCURRENCY,
+                        help="max requests in flight per host")
+    parser.add_argument('--requests-per-minute', type=int, default=ENTSOE_REQUESTS_PER_MINUTE)
+    parser.add_argument('--data-dir', default='data')
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = get_client(os.getenv('ENTSOE_API_KEY', 'default_api_key'))
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    jobs = build_job_matrix(args.zones, parse_years(args.years), args.types)
+    print(f"Running {len(jobs)} jobs")
+    t0 = time.time()
+    results = run_jobs(client, jobs, host_limits={DEFAULT_HOST: args.concurrency},
+                       requests_per_minute=args.requests_per_minute)
+    for (zone, year, document_type), frame in results.items():
+        if frame.empty:
+            print(f"No data for {document_type} {zone} {year}")
+            continue
+        file_path = os.path.join(args.data_dir, f'{document_type}_prices_{zone}_{year}.csv')
+        frame.to_csv(file_path)
+        print(f"Saved data to {file_path}")
+    print(f"Finished {len(jobs)} jobs in {time.time() - t0:.1f} s")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Balancing-market ingestion: FCR / aFRR capacity and energy prices as typed tables.
+
+The raw A81 (contracted reserve capacity) and A84 (activated balancing energy)
+documents are stream-parsed with entsoe_parse.parse_balancing_document into
+columns keyed by UTC timestamp, product and direction, fetched in month-sized
+chunks in parallel through entsoe_fetch.fetch_chunked, and stored as one
+Parquet file per dataset, zone and year in data/balancing next to the DA data.
+Analyses read the Parquet files instead of re-parsing XML on every run.
+
+Usage:
+    from entsoe_balancing import get_balancing_prices_chunked, save_balancing, load_balancing
+    fcr = get_balancing_prices_chunked(raw_client, 'FCR_capacity', 'NL', start, end, max_workers=8)
+    save_balancing(fcr, 'FCR_capacity', 'NL')
+    fcr = load_balancing('FCR_capacity', 'NL', [2024])
+@author: Mayk Thewessen
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from entsoe.exceptions import NoMatchingDataError
+
+from entsoe_fetch import fetch_chunked
+from entsoe_parse import balancing_to_frame, iter_xml_documents, parse_balancing_document
+
+
+BALANCING_DIR = os.path.join('data', 'balancing')
+# One month per request keeps the capacity ZIPs and the aFRR energy documents small
+BALANCING_CHUNK_SIZE = pd.Timedelta(days=31)
+# ENTSO-E returns at most 100 TimeSeries per capacity document; offset pages through the rest
+PAGE_SIZE = 100
+MAX_OFFSET = 4800
+
+# dataset -> (query kind, processType or businessType, type_MarketAgreement.type)
+DATASETS = {
+    'FCR_capacity': ('capacity', 'A52', 'A01'),   # A52 = FCR, A01 = daily auction
+    'aFRR_capacity': ('capacity', 'A51', 'A01'),  # A51 = aFRR
+    'aFRR_energy': ('energy', 'A96', None),       # A96 = aFRR activated energy prices
+}
+KEY_COLUMNS = ['timestamp', 'product', 'direction', 'market_agreement', 'resolution_s']
+CATEGORY_COLUMNS = ['product', 'direction', 'market_agreement']
+
+
+def count_time_series(content):
+    return sum(xml.count(b'<TimeSeries>') for xml in iter_xml_documents(content))
+
+
+def query_balancing(raw_client, dataset, country_code, start, end):
+    """Query one dataset through an EntsoeRawClient and return it as a typed DataFrame for [start, end)."""
+    kind, code, market_agreement = DATASETS[dataset]
+    if kind == 'energy':
+        pages = [raw_client.query_activated_balancing_energy_prices(
+            country_code, start=start, end=end, process_type='A16', business_type=code)]
+    else:
+        pages = []
+        for offset in range(0, MAX_OFFSET + 1, PAGE_SIZE):
+            try:
+                content = raw_client.query_contracted_reserve_prices_procured_capacity(
+                    country_code, start=start, end=end, process_type=code,
+                    type_marketagreement_type=market_agreement, offset=offset)
+            except NoMatchingDataError:
+                if offset == 0:
+                    raise
+                break
+            pages.append(content)
+            if count_time_series(content) < PAGE_SIZE:
+                break
+
+    parsed = [parse_balancing_document(content) for content in pages]
+    columns = {name: np.concatenate([p[name] for p in parsed]) for name in parsed[0]}
+    # Capacity documents cover whole auction days, so cut back to the requested window
+    in_window = (columns['timestamp'] >= start.timestamp()) & (columns['timestamp'] < end.timestamp())
+    df = balancing_to_frame({name: values[in_window] for name, values in columns.items()})
+    if df.empty:
+        raise NoMatchingDataError
+    return df
+
+
+def tidy_balancing(df):
+    """Sort, drop rows repeated by overlapping chunks or pages (last one wins) and restore the dtypes."""
+    df = df.reset_index()
+    df = df.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+    df = df.sort_values(KEY_COLUMNS, kind='stable')
+    for name in CATEGORY_COLUMNS:
+        df[name] = df[name].astype(str).astype('category')
+    df['resolution_s'] = df['resolution_s'].astype(np.int32)
+    return df.set_index('timestamp')
+
+
+def get_balancing_prices_chunked(raw_client, dataset, country_code, start, end,
+                                 chunk_size=BALANCING_CHUNK_SIZE, max_workers=1, **fetch_kwargs):
+    """Retrieve one balancing dataset in month-sized chunks, optionally several in parallel.
+
+    Extra keyword arguments (ledger_dir, retries, only_failed, ...) are passed
+    on to fetch_chunked(); failed chunks go to the failed-chunk ledger under
+    '{dataset} {country_code}'.
+    """
+    print(f"Starting to retrieve {dataset} prices in {chunk_size / pd.Timedelta(days=1):g}-day chunks ({max_workers} workers):")
+
+    def query(chunk_start, chunk_end):
+        return query_balancing(raw_client, dataset, country_code, chunk_start, chunk_end)
+
+    fetch_kwargs.setdefault('label', f'{dataset} {country_code}')
+    result = fetch_chunked(query, start, end, chunk_size=chunk_size, max_workers=max_workers, **fetch_kwargs)
+    print("\n")
+    if fetch_kwargs.get('return_failed'):
+        df, failed_chunks = result
+        return (tidy_balancing(df) if not df.empty else df), failed_chunks
+    return tidy_balancing(result) if not result.empty else result
+
+
+def balancing_path(dataset, country_code, year, data_dir=BALANCING_DIR):
+    return os.path.join(data_dir, f'{dataset}_{country_code}_{year}.parquet')
+
+
+def save_balancing(df, dataset, country_code, data_dir=BALANCING_DIR, tz='Europe/Brussels'):
+    """Merge df into the per-year Parquet files (rows of df replace stored rows with the same key)."""
+    paths = []
+    if df.empty:
+        return paths
+    os.makedirs(data_dir, exist_ok=True)
+    years = df.index.tz_convert(tz).year
+    for year in np.unique(years):
+        file_path = balancing_path(dataset, country_code, year, data_dir)
+        part = df[years == year]
+        if os.path.exists(file_path):
+            part = pd.concat([pd.read_parquet(file_path), part])
+        part = tidy_balancing(part)
+        part.to_parquet(file_path + '.tmp', engine='pyarrow', compression='zstd')
+        os.replace(file_path + '.tmp', file_path)
+        print(f"Saved {len(part)} rows to {file_path}")
+        paths.append(file_path)
+    return paths
+
+
+def load_balancing(dataset, country_code, years, data_dir=BALANCING_DIR, columns=None, filters=None):
+    """Read the stored Parquet files of the given years into one DataFrame (UTC index).
+
+    columns / filters are passed to pyarrow, e.g. filters=[('direction', '==', 'up')].
+    """
+    frames = []
+    for year in years:
+        file_path = balancing_path(dataset, country_code, year, data_dir)
+        if os.path.exists(file_path):
+            frames.append(pd.read_parquet(file_path, engine='pyarrow', columns=columns, filters=filters))
+        else:
+            print(f"No stored {dataset} data for {country_code} {year} ({file_path})")
+    return pd.concat(frames) if frames else pd.DataFrame()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local fetch broker shared by all ENTSO-E scripts on this machine.
+
+The broker is a small HTTP proxy in front of the ENTSO-E API. Scripts send
+their requests to it instead of to the API (set ENTSOE_BROKER_URL, see
+entsoe_clients). For every request it
+  - serves the response from the shared response cache (entsoe_cache) if possible,
+  - coalesces identical requests that are in flight: the second caller waits
+    for the first one's answer instead of sending the same request again,
+  - keeps successful answers for a short time in memory, so scripts that run
+    a few seconds apart share recent windows that are too new for the cache,
+  - sends everything else upstream within one request-per-minute budget for
+    all callers on the host.
+Concurrent runs of the v5, v8 and v10 scripts then cost the API quota of one run.
+
+Usage:
+    python entsoe_broker.py --port 8766
+    # in .env of every script: ENTSOE_BROKER_URL=http://127.0.0.1:8766/api
+@author: Mayk Thewessen
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from entsoe_cache import ResponseCache
+from entsoe_clients import make_session
+from entsoe_fetch import ENTSOE_REQUESTS_PER_MINUTE, RateLimiter
+
+
+DEFAULT_UPSTREAM = os.getenv("ENTSOE_ENDPOINT_URL") or "https://web-api.tp.entsoe.eu/api"
+DEFAULT_PORT = 8766
+# Finished answers are shared with callers that ask for the same window within this many seconds
+RECENT_TTL = 60
+
+
+class _Flight:
+    """One upstream request that other callers can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class FetchBroker:
+    """Coalescing, caching and rate-limiting proxy for ENTSO-E GET requests.
+
+    fetch(params) returns (status, headers, body). The security token of the
+    caller is forwarded upstream but is not part of the request key.
+    """
+
+    def __init__(self, upstream_url=DEFAULT_UPSTREAM, session=None,
+                 requests_per_minute=ENTSOE_REQUESTS_PER_MINUTE, recent_ttl=RECENT_TTL, timeout=120):
+        self.upstream_url = upstream_url
+        self.session = session if session is not None else make_session()
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.recent_ttl = recent_ttl
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'upstream': 0, 'cache_hits': 0, 'coalesced': 0, 'recent_hits': 0}
+        self._inflight = {}
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def fetch(self, params):
+        key = ResponseCache.make_key(params)
+        with self._lock:
+            self.stats['requests'] += 1
+            recent = self._recent.get(key)
+            if recent is not None and time.monotonic() - recent[0] < self.recent_ttl:
+                self.stats['recent_hits'] += 1
+                return recent[1]
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            flight.done.wait()
+            return flight.result
+
+        try:
+            flight.result = self._fetch_upstream(params)
+            if flight.result[0] == 200:
+                with self._lock:
+                    self._recent[key] = (time.monotonic(), flight.result)
+                    self._expire_recent()
+        except Exception as e:
+            flight.result = (502, {'Content-Type': 'text/plain'}, f"Broker error: {e}".encode())
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+        return flight.result
+
+    def _fetch_upstream(self, params):
+        cache = getattr(self.session, 'cache', None)
+        cached = cache.get(params) if cache is not None else None
+        if cached is not None:
+            self._count('cache_hits')
+            content, meta = cached
+            return 200, {'Content-Type': meta.get('content_type', '')}, content
+
+        # Only requests that really go to ENTSO-E take from the shared budget
+        self.rate_limiter.acquire()
+        self._count('upstream')
+        response = self.session.get(self.upstream_url, params=params, timeout=self.timeout)
+        headers = {'Content-Type': response.headers.get('content-type', '')}
+        if 'Retry-After' in response.headers:
+            headers['Retry-After'] = response.headers['Retry-After']
+        return response.status_code, headers, response.content
+
+    def _expire_recent(self):
+        now = time.monotonic()
+        for key in [k for k, (t, _) in self._recent.items() if now - t >= self.recent_ttl]:
+            del self._recent[key]
+
+
+def make_broker_server(broker, host='127.0.0.1', port=DEFAULT_PORT):
+    """ThreadingHTTPServer that answers /api with broker.fetch() and /stats with the broker stats as JSON."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.rstrip('/').endswith('/stats'):
+                status, headers, body = 200, {'Content-Type': 'application/json'}, json.dumps(broker.stats).encode()
+            else:
+                status, headers, body = broker.fetch(dict(parse_qsl(url.query)))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local broker that coalesces, caches and rate-limits ENTSO-E requests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--upstream', default=DEFAULT_UPSTREAM)
+    parser.add_argument('--requests-per-minute', type=int, default=ENTSOE_REQUESTS_PER_MINUTE)
+    args = parser.parse_args()
+
+    broker = FetchBroker(args.upstream, requests_per_minute=args.requests_per_minute)
+    httpd = make_broker_server(broker, args.host, args.port)
+    print(f"ENTSO-E broker on http://{args.host}:{httpd.server_address[1]}/api -> {args.upstream}")
+    print(f"Set ENTSOE_BROKER_URL=http://{args.host}:{httpd.server_address[1]}/api in .env to route scripts through it")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        print(f"Broker stats: {broker.stats}")
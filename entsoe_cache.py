@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+On-disk cache for raw ENTSO-E API responses.
+
+Every response is stored gzip-compressed under a key derived from the request
+(document type, zone, period start/end and all other parameters; the security
+token is left out). Least recently used entries are evicted once the cache
+grows beyond max_bytes. Re-running an analysis or re-parsing after a parser
+change is then served from disk instead of the API.
+
+Usage:
+    from entsoe_cache import CachingSession
+    client = EntsoePandasClient(api_key=api_key, session=CachingSession())
+@author: Mayk Thewessen
+"""
+
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import requests
+
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'entsoe')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+# Windows that ended less than this long ago can still change (late imbalance data, no DA yet), so they are not cached
+DEFAULT_MIN_AGE = pd.Timedelta(days=1)
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of raw response bodies, one gzip file + one JSON sidecar per request."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = sum(os.path.getsize(os.path.join(cache_dir, name))
+                               for name in os.listdir(cache_dir) if not name.endswith('.tmp'))
+
+    @staticmethod
+    def make_key(params):
+        # Canonical JSON of the request parameters without the API key
+        key_params = {k: str(v) for k, v in params.items() if k != 'securityToken'}
+        return hashlib.sha256(json.dumps(key_params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        return os.path.join(self.cache_dir, f'{key}.gz'), os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, params):
+        """Return (content, meta) for a cached request, or None."""
+        data_path, meta_path = self._paths(self.make_key(params))
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with gzip.open(data_path, 'rb') as f:
+                content = f.read()
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        # Touch the entry so eviction sees it as recently used; another process may have just evicted it
+        now = time.time()
+        with contextlib.suppress(OSError):
+            os.utime(data_path, (now, now))
+        return content, meta
+
+    def put(self, params, content, content_type='', encoding=None):
+        key = self.make_key(params)
+        data_path, meta_path = self._paths(key)
+        meta = {
+            'params': {k: str(v) for k, v in params.items() if k != 'securityToken'},
+            'content_type': content_type,
+            'encoding': encoding,
+            'size': len(content),
+            'stored_at': pd.Timestamp.now(tz='UTC').isoformat(),
+        }
+        with self._lock:
+            old_size = sum(os.path.getsize(p) for p in (data_path, meta_path) if os.path.exists(p))
+            with gzip.open(data_path + '.tmp', 'wb', compresslevel=6) as f:
+                f.write(content)
+            os.replace(data_path + '.tmp', data_path)
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + '.tmp', meta_path)
+            self.total_bytes += os.path.getsize(data_path) + os.path.getsize(meta_path) - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop least recently used entries until the cache fits in 90% of max_bytes
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.gz'):
+                data_path = os.path.join(self.cache_dir, name)
+                meta_path = data_path[:-3] + '.json'
+                size = os.path.getsize(data_path)
+                if os.path.exists(meta_path):
+                    size += os.path.getsize(meta_path)
+                entries.append((os.path.getmtime(data_path), size, data_path, meta_path))
+        entries.sort()
+        target = 0.9 * self.max_bytes
+        for _, size, data_path, meta_path in entries:
+            if self.total_bytes <= target:
+                break
+            for path in (data_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.total_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, name))
+            self.total_bytes = 0
+
+
+def is_cacheable(params, min_age=DEFAULT_MIN_AGE):
+    """Only cache windows that ended at least min_age ago; more recent data may still be published or corrected."""
+    period_end = params.get('periodEnd')
+    if period_end is None:
+        return False
+    period_end = pd.Timestamp(str(period_end), tz='UTC')  # ENTSO-E format YYYYMMDDhhmm in UTC
+    return period_end <= pd.Timestamp.now(tz='UTC') - min_age
+
+
+class CachingSession(requests.Session):
+    """requests.Session that answers ENTSO-E GET requests from a ResponseCache when possible.
+
+    Pass it as `session=` to EntsoePandasClient / EntsoeRawClient; all query_*
+    methods then share the cache. Counts hits and misses in self.stats.
+    With refresh=True every request goes to the API and the cached entry is
+    replaced by the new answer (used to pick up re-published data).
+    """
+
+    def __init__(self, cache=None, min_age=DEFAULT_MIN_AGE, refresh=False):
+        super().__init__()
+        self.cache = cache if cache is not None else ResponseCache()
+        self.min_age = min_age
+        self.refresh = refresh
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, url, params=None, **kwargs):
+        if params is None:
+            return super().get(url, **kwargs)
+        cached = None if self.refresh else self.cache.get(params)
+        if cached is not None:
+            self.stats['hits'] += 1
+            content, meta = cached
+            response = requests.Response()
+            response.status_code = 200
+            response._content = content
+            response.headers['content-type'] = meta.get('content_type', '')
+            response.encoding = meta.get('encoding')
+            response.url = url
+            return response
+
+        self.stats['misses'] += 1
+        response = super().get(url, params=params, **kwargs)
+        # Errors and "no data yet" answers are never cached
+        if response.status_code == 200 and b'No matching data found' not in response.content \
+                and is_cacheable(params, self.min_age):
+            self.cache.put(params, response.content, response.headers.get('content-type', ''), response.encoding)
+        return response
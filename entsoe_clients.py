@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+One shared HTTP session for all ENTSO-E clients in a process.
+
+get_client() / get_raw_client() return EntsoePandasClient / EntsoeRawClient
+instances that share one requests session: a keep-alive connection pool
+sized for the parallel chunk fetches, gzip-compressed responses and the raw
+response cache from entsoe_cache. Reusing pooled connections skips the TCP +
+TLS handshake for every request after the first. connection_stats() reports
+how many requests went over a reused connection and how many opened a new one.
+
+When ENTSOE_BROKER_URL is set (e.g. in .env), the clients send their requests
+to the local fetch broker (entsoe_broker) instead of straight to ENTSO-E.
+
+Usage:
+    from entsoe_clients import get_client, get_raw_client, print_connection_stats
+    client = get_client(api_key)
+    raw_client = get_raw_client(api_key)
+    ...
+    print_connection_stats()
+@author: Mayk Thewessen
+"""
+
+import os
+import threading
+
+from requests.adapters import HTTPAdapter
+
+from entsoe_cache import CachingSession
+
+
+# Large enough for the thread pools in entsoe_fetch / entsoe_async, so no connection is thrown away
+DEFAULT_POOL_SIZE = 32
+BROKER_URL_ENV = 'ENTSOE_BROKER_URL'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def make_session(pool_size=DEFAULT_POOL_SIZE, cache=None, refresh=False):
+    """Create a CachingSession with a keep-alive pool of pool_size connections per host."""
+    session = CachingSession(cache=cache, refresh=refresh)
+    # Retries are handled per chunk in entsoe_fetch, so urllib3 should not retry on its own
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+    return session
+
+
+def get_shared_session():
+    """Process-wide session shared by every client created through this module."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def set_endpoint_url(url):
+    """Send all entsoe-py requests of this process to url (entsoe reads ENTSOE_ENDPOINT_URL only at import)."""
+    import entsoe.entsoe
+    os.environ['ENTSOE_ENDPOINT_URL'] = url
+    entsoe.entsoe.URL = url
+
+
+def _route_through_broker():
+    broker_url = os.getenv(BROKER_URL_ENV)
+    if broker_url:
+        set_endpoint_url(broker_url)
+
+
+def get_client(api_key, **kwargs):
+    from entsoe import EntsoePandasClient
+    _route_through_broker()
+    return EntsoePandasClient(api_key=api_key, session=get_shared_session(), **kwargs)
+
+
+def get_raw_client(api_key, **kwargs):
+    from entsoe import EntsoeRawClient
+    _route_through_broker()
+    return EntsoeRawClient(api_key=api_key, session=get_shared_session(), **kwargs)
+
+
+def connection_stats(session=None):
+    """Count requests, new connections and reused connections over all pools of the session."""
+    session = session or get_shared_session()
+    stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0,
+             'cache_hits': getattr(session, 'stats', {}).get('hits', 0)}
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            stats['requests'] += pool.num_requests
+            stats['new_connections'] += pool.num_connections
+    stats['reused_connections'] = max(stats['requests'] - stats['new_connections'], 0)
+    return stats
+
+
+def print_connection_stats(session=None):
+    stats = connection_stats(session)
+    print(f"HTTP requests: {stats['requests']} ({stats['reused_connections']} on reused connections, "
+          f"{stats['new_connections']} new connections), cache hits: {stats['cache_hits']}")
+    return stats
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Long-running D+1 ingest: appends tomorrow's day-ahead prices as soon as they are published.
+
+Every day from the SDAC publication time (13:00 local, results come out around
+12:45) the daemon polls ENTSO-E for tomorrow's prices of each zone, with
+growing pauses between attempts, and appends them to the per-year CSV
+through update_da_prices_csv. As soon as a zone's curve for tomorrow is
+complete, the downstream aggregates are refreshed (data/DA_hourly_avg_prices
+per zone) and the optional --on-update command is run, e.g. a dashboard build.
+
+Usage:
+    python entsoe_daemon.py --zones NL BE
+    python entsoe_daemon.py --once                      # one poll cycle now, e.g. from cron
+    python entsoe_daemon.py --on-update "python EPEX_hourly_avg_prices_v5.py"
+@author: Mayk Thewessen
+"""
+
+import argparse
+import glob
+import os
+import subprocess
+import time
+
+import pandas as pd
+
+from entsoe_align import duration_hours, weighted_mean
+from entsoe_fetch import DA_PUBLICATION_HOUR, read_last_rows, update_da_prices_csv
+from entsoe_load import DA_COLUMN_TYPES, read_price_csv
+
+
+DATA_DIR = 'data'
+DEFAULT_TZ = 'Europe/Brussels'
+# Give up on tomorrow's curve at this hour (fallback auctions are decoupled by then) and try again the next day
+POLL_DEADLINE_HOUR = 20
+FIRST_RETRY = 60          # seconds
+MAX_RETRY = 15 * 60
+
+
+def da_file_path(zone, year, data_dir=DATA_DIR):
+    """data/DA_prices_{year}.csv for NL (the existing files), data/DA_prices_{zone}_{year}.csv for other zones."""
+    if zone == 'NL':
+        return os.path.join(data_dir, f'DA_prices_{year}.csv')
+    return os.path.join(data_dir, f'DA_prices_{zone}_{year}.csv')
+
+
+def stored_until(file_path, tz=DEFAULT_TZ):
+    """End (exclusive) of the data in a DA CSV, or None when the file is missing or empty."""
+    if not os.path.exists(file_path):
+        return None
+    last_rows = read_last_rows(file_path)
+    if not last_rows:
+        return None
+    times = [pd.Timestamp(row.split(',')[0]).tz_convert(tz) for row in last_rows]
+    step = times[-1] - times[-2] if len(times) == 2 else pd.Timedelta(hours=1)
+    if step <= pd.Timedelta(0):
+        step = pd.Timedelta(hours=1)
+    return times[-1] + step
+
+
+def ingest_day(client, zone, delivery_day, data_dir=DATA_DIR, tz=DEFAULT_TZ, **fetch_kwargs):
+    """Append everything up to the end of delivery_day for one zone.
+
+    Returns (rows_added, complete); complete is True once the stored data reaches the end of delivery_day.
+    """
+    target_end = delivery_day + pd.Timedelta(days=1)
+    # Auction results are out from 13:00 the day before delivery
+    published_at = delivery_day - pd.Timedelta(days=1) + pd.Timedelta(hours=DA_PUBLICATION_HOUR)
+    years = [delivery_day.year]
+    if delivery_day.dayofyear == 1 and os.path.exists(da_file_path(zone, delivery_day.year - 1, data_dir)):
+        years.insert(0, delivery_day.year - 1)  # finish the old year's file first
+    rows_added = 0
+    for year in years:
+        rows_added += update_da_prices_csv(client, zone, da_file_path(zone, year, data_dir), year,
+                                           tz=tz, now=published_at, **fetch_kwargs)
+    until = stored_until(da_file_path(zone, delivery_day.year, data_dir), tz)
+    return rows_added, until is not None and until >= target_end
+
+
+def refresh_hourly_averages(zone, data_dir=DATA_DIR):
+    """Rebuild the hour x year average price table (as in EPEX_hourly_avg_prices_v5) from all yearly files of a zone."""
+    pattern = 'DA_prices_[0-9][0-9][0-9][0-9].csv' if zone == 'NL' else f'DA_prices_{zone}_[0-9][0-9][0-9][0-9].csv'
+    files = sorted(glob.glob(os.path.join(data_dir, pattern)))
+    if not files:
+        return None
+    df = pd.concat([read_price_csv(f, 'time', column_types=DA_COLUMN_TYPES).reset_index() for f in files],
+                   ignore_index=True)
+    df = df.drop_duplicates(subset='time', keep='last')
+    # Time-weighted, so days with 15-min MTUs count as much as hourly days
+    df['hours'] = duration_hours(df['time'])
+    hourly = weighted_mean(df, [df['time'].dt.year.rename('year'), df['time'].dt.hour.rename('hour')], 'DA_price')
+    hourly = hourly.unstack('year').round(1)
+    hourly['Average'] = hourly.mean(axis=1).round(1)
+    out_path = os.path.join(data_dir, f'DA_hourly_avg_prices_{zone}.csv')
+    hourly.to_csv(out_path + '.tmp')
+    os.replace(out_path + '.tmp', out_path)
+    print(f"Refreshed {out_path}")
+    return out_path
+
+
+def run_on_update(command, zone, delivery_day):
+    if not command:
+        return
+    env = dict(os.environ, ENTSOE_ZONE=zone, ENTSOE_DELIVERY_DAY=delivery_day.strftime('%Y-%m-%d'))
+    print(f"Running on-update command: {command}")
+    subprocess.run(command, shell=True, env=env, check=False)
+
+
+def poll_cycle(client, zones, delivery_day, data_dir=DATA_DIR, tz=DEFAULT_TZ, deadline=None,
+               on_update=None, sleep=time.sleep, **fetch_kwargs):
+    """Poll until every zone has delivery_day stored or the deadline passes; returns the zones still missing."""
+    pending = list(zones)
+    delay = FIRST_RETRY
+    while pending:
+        for zone in list(pending):
+            try:
+                rows_added, complete = ingest_day(client, zone, delivery_day, data_dir, tz, **fetch_kwargs)
+            except Exception as e:
+                print(f"Error ingesting {zone} {delivery_day.date()}: {e}")
+                continue
+            if complete:
+                pending.remove(zone)
+                print(f"{zone}: day-ahead prices for {delivery_day.date()} stored")
+                if rows_added:
+                    refresh_hourly_averages(zone, data_dir)
+                    run_on_update(on_update, zone, delivery_day)
+        if not pending:
+            break
+        now = pd.Timestamp.now(tz=tz)
+        if deadline is not None and now + pd.Timedelta(seconds=delay) > deadline:
+            print(f"Still missing {delivery_day.date()} for {', '.join(pending)}; giving up until tomorrow")
+            break
+        print(f"Not yet published for {', '.join(pending)}; next attempt in {delay} s")
+        sleep(delay)
+        delay = min(delay * 2, MAX_RETRY)
+    return pending
+
+
+def next_publication(now, tz=DEFAULT_TZ):
+    """Next moment at which tomorrow's auction results should be available."""
+    today = now.tz_convert(tz).normalize()
+    publication = today + pd.Timedelta(hours=DA_PUBLICATION_HOUR)
+    deadline = today + pd.Timedelta(hours=POLL_DEADLINE_HOUR)
+    if now >= deadline:
+        publication += pd.Timedelta(days=1)
+    return publication
+
+
+def run_daemon(client, zones, data_dir=DATA_DIR, tz=DEFAULT_TZ, on_update=None, **fetch_kwargs):
+    """Scheduler loop: catch up now, then poll for D+1 every day from the publication time until the deadline."""
+    while True:
+        now = pd.Timestamp.now(tz=tz)
+        publication = next_publication(now, tz)
+        if now < publication:
+            print(f"Waiting until {publication} for the next auction results")
+            time.sleep((publication - now).total_seconds())
+        today = pd.Timestamp.now(tz=tz).normalize()
+        poll_cycle(client, zones, today + pd.Timedelta(days=1), data_dir, tz,
+                   deadline=today + pd.Timedelta(hours=POLL_DEADLINE_HOUR), on_update=on_update, **fetch_kwargs)
+        # Sleep past the deadline, so the next loop waits for tomorrow's publication
+        now = pd.Timestamp.now(tz=tz)
+        deadline = today + pd.Timedelta(hours=POLL_DEADLINE_HOUR)
+        if now < deadline:
+            time.sleep((deadline - now).total_seconds())
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from entsoe_clients import get_client
+
+    parser = argparse.ArgumentParser(description="Append day-ahead prices for tomorrow as soon as they are published")
+    parser.add_argument('--zones', nargs='+', default=['NL'])
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--on-update', default=None, help="shell command to run after new prices were stored")
+    parser.add_argument('--once', action='store_true', help="run one poll cycle for the latest auction and exit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = get_client(os.getenv('ENTSOE_API_KEY', 'default_api_key'))
+    if args.once:
+        now = pd.Timestamp.now(tz=DEFAULT_TZ)
+        delivery_day = now.normalize() + pd.Timedelta(days=1 if now.hour >= DA_PUBLICATION_HOUR else 0)
+        missing = poll_cycle(client, args.zones, delivery_day, args.data_dir,
+                             deadline=now, on_update=args.on_update, fast_parse=True)
+        raise SystemExit(1 if missing else 0)
+    try:
+        run_daemon(client, args.zones, args.data_dir, on_update=args.on_update, fast_parse=True)
+    except KeyboardInterrupt:
+        print("Stopped")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Constant-memory Excel export of price series, straight from the store.
+
+DataFrame.to_excel() builds the whole sheet in memory before writing. Here
+openpyxl's write-only mode streams every row batch into the workbook's
+temporary sheet files, and the store is read one month at a time, so
+memory stays at about one month of data however many years and zones are
+exported. A sheet that reaches Excel's row limit continues on a
+new sheet ("NL (2)"); per_month=True writes one sheet per month instead.
+Times are written as local (tz) wall-clock times, since Excel has no time zones.
+
+Usage:
+    python entsoe_excel.py imbalance_NL_2024.xlsx --dataset imbalance --zones NL --start 2024-01-01 --end 2025-01-01
+    python entsoe_excel.py DA_2019_2025.xlsx --dataset DA --zones NL BE DE_LU --per-month
+
+    from entsoe_excel import write_excel
+    write_excel('outfile_imb.xlsx', imb)               # a DataFrame or an iterable of row batches
+@author: Mayk Thewessen
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from entsoe_store import STORE_DIR, coverage, read_store
+
+
+DEFAULT_TZ = 'Europe/Amsterdam'
+EXCEL_MAX_ROWS = 1048576  # rows per sheet, header included
+
+
+def _sheet_title(title):
+    # Excel sheet names: at most 31 characters, none of []:*?/\
+    return re.sub(r'[\[\]:*?/\\]', '-', str(title))[:31]
+
+
+def _cell_values(column):
+    # float32 prices (store, grid, series, shared tables) would be written as their binary expansion
+    # (83.22000122070312); their shortest repr is the decimal that was stored
+    if column.dtype == np.float32:
+        column = pd.Series([float(str(v)) for v in column.to_numpy()], index=column.index)
+    # NaN is not a valid Excel number; None leaves the cell empty
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+class StreamingExcelWriter:
+    """Write-only workbook that appends DataFrame batches to named sheets and rolls over full sheets."""
+
+    def __init__(self, file_path, max_rows=EXCEL_MAX_ROWS, tz=DEFAULT_TZ):
+        self.file_path = file_path
+        self.max_rows = max_rows
+        self.tz = tz
+        self.workbook = Workbook(write_only=True)
+        self.sheets = {}      # name -> [worksheet, rows written, part number]
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def _new_sheet(self, name, part, header):
+        title = _sheet_title(name if part == 1 else f'{name} ({part})')
+        sheet = self.workbook.create_sheet(title)
+        sheet.column_dimensions['A'].width = 20
+        sheet.freeze_panes = 'A2'
+        sheet.append(header)
+        return [sheet, 1, part]
+
+    def write(self, df, sheet_name='data'):
+        """Append the rows of df (DatetimeIndex, value columns) to sheet_name."""
+        if len(df) == 0:
+            return
+        header = [f'time ({self.tz})'] + [str(c) for c in df.columns]
+        if sheet_name not in self.sheets:
+            self.sheets[sheet_name] = self._new_sheet(sheet_name, 1, header)
+        index = df.index.tz_convert(self.tz).tz_localize(None) if df.index.tz is not None else df.index
+        times = index.to_pydatetime()
+        columns = [_cell_values(df[c]) for c in df.columns]
+        for row in zip(times, *columns):
+            state = self.sheets[sheet_name]
+            if state[1] >= self.max_rows:
+                state = self.sheets[sheet_name] = self._new_sheet(sheet_name, state[2] + 1, header)
+            state[0].append(row)
+            state[1] += 1
+        self.rows += len(df)
+
+    def close(self):
+        if not self.sheets:
+            self.workbook.create_sheet('empty')
+        self.workbook.save(self.file_path + '.tmp')
+        os.replace(self.file_path + '.tmp', self.file_path)
+
+
+def _month_batches(df, tz):
+    # Split a time-ordered batch at local month boundaries
+    months = df.index.tz_convert(tz).strftime('%Y-%m') if df.index.tz is not None else df.index.strftime('%Y-%m')
+    months = np.asarray(months)
+    bounds = np.r_[0, np.flatnonzero(months[1:] != months[:-1]) + 1, len(months)]
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        yield months[first], df.iloc[first:last]
+
+
+def write_excel(file_path, frames, sheet_name='data', per_month=False, max_rows=EXCEL_MAX_ROWS, tz=DEFAULT_TZ):
+    """Stream a DataFrame / Series or an iterable of time-ordered batches to an .xlsx file; returns the row count."""
+    if isinstance(frames, (pd.DataFrame, pd.Series)):
+        frames = [frames]
+    with StreamingExcelWriter(file_path, max_rows, tz) as writer:
+        for df in frames:
+            if isinstance(df, pd.Series):
+                df = df.to_frame(df.name if df.name is not None else 'price')
+            if per_month:
+                for month, part in _month_batches(df, tz):
+                    writer.write(part, f'{sheet_name} {month}')
+            else:
+                writer.write(df, sheet_name)
+    return writer.rows
+
+
+def _localize(value, tz):
+    value = pd.Timestamp(value)
+    return value.tz_localize(tz) if value.tz is None else value
+
+
+def iter_store_batches(dataset, zone, start=None, end=None, columns=None, tz=DEFAULT_TZ, store_dir=STORE_DIR):
+    """Yield dataset/zone from the store one UTC month at a time (clipped to [start, end)).
+
+    Without start/end the range comes from the coverage manifest, so no data is read to find it.
+    """
+    index = coverage(dataset, zone, store_dir, tz=tz)
+    if len(index) == 0:
+        return
+    start = pd.Timestamp(int(index.starts[0]), unit='s', tz='UTC') if start is None else _localize(start, tz)
+    end = pd.Timestamp(int(index.ends[-1]), unit='s', tz='UTC') if end is None else _localize(end, tz)
+    month_start = start.tz_convert('UTC').tz_localize(None).to_period('M').to_timestamp().tz_localize('UTC')
+    while month_start < end:
+        month_end = month_start + pd.offsets.MonthBegin(1)
+        df = read_store(dataset, zone, max(month_start, start), min(month_end, end), columns, tz=tz,
+                        store_dir=store_dir)
+        if len(df):
+            yield df
+        month_start = month_end
+
+
+def export_store_excel(file_path, dataset, zones, start=None, end=None, columns=None, per_month=False,
+                       max_rows=EXCEL_MAX_ROWS, tz=DEFAULT_TZ, store_dir=STORE_DIR):
+    """Export dataset for one or more zones to one workbook (sheets per zone, or per zone and month)."""
+    zones = [zones] if isinstance(zones, str) else zones
+    with StreamingExcelWriter(file_path, max_rows, tz) as writer:
+        for zone in zones:
+            for df in iter_store_batches(dataset, zone, start, end, columns, tz, store_dir):
+                if per_month:
+                    for month, part in _month_batches(df, tz):
+                        writer.write(part, f'{zone} {month}')
+                else:
+                    writer.write(df, zone)
+    print(f"Wrote {writer.rows} rows in {len(writer.workbook.worksheets)} sheets to {file_path}")
+    return writer.rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream prices from the store into an Excel workbook")
+    parser.add_argument('file', help="output .xlsx")
+    parser.add_argument('--dataset', default='DA')
+    parser.add_argument('--zones', nargs='+', default=['NL'])
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--columns', nargs='+', default=None)
+    parser.add_argument('--per-month', action='store_true', help="one sheet per zone and month")
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    export_store_excel(args.file, args.dataset, args.zones, args.start, args.end, args.columns,
+                       per_month=args.per_month, store_dir=args.store_dir)
+    print(f"Done in {time.perf_counter() - t0:.1f} s")
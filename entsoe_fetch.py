@@ -0,0 +1,722 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared ENTSO-E retrieval helpers used by the DA / imbalance scripts.
+
+get_da_prices_chunked() used to be copy-pasted into every script; it now lives
+here so all scripts fetch the same way. Chunks can be fetched in parallel
+through a bounded thread pool that stays under the ENTSO-E request budget.
+@author: Mayk Thewessen
+"""
+
+import datetime
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from entsoe.exceptions import NoMatchingDataError
+
+from entsoe_align import describe_resolutions, resolution_runs, to_epoch_seconds
+from entsoe_parse import query_day_ahead_prices_fast
+
+
+# ENTSO-E allows 400 requests per minute per security token
+ENTSOE_REQUESTS_PER_MINUTE = 400
+DEFAULT_CHUNK_SIZE = pd.Timedelta(days=90)
+# 15-min imbalance data has 4x the rows of hourly DA, so it is requested in smaller windows
+IMBALANCE_CHUNK_SIZE = pd.Timedelta(days=30)
+DEFAULT_FAILED_LEDGER = os.path.join('ledger', 'failed_chunks.json')
+
+
+#%% Document queries
+
+def query_document(client, document_type, country_code, start, end):
+    """Query one document type through an EntsoePandasClient.
+
+    document_type is 'DA' (A44 day-ahead prices), 'imbalance' (A85 imbalance
+    prices) or 'FCR' (A81 contracted FCR reserve prices, daily auction).
+    """
+    if document_type == 'DA':
+        return client.query_day_ahead_prices(country_code, start=start, end=end)
+    if document_type == 'imbalance':
+        return client.query_imbalance_prices(country_code, start=start, end=end, psr_type=None)
+    if document_type == 'FCR':
+        # A52 = Frequency containment reserve, A01 = daily contract
+        return client.query_contracted_reserve_prices(country_code, process_type='A52',
+                                                      type_marketagreement_type='A01',
+                                                      start=start, end=end)
+    raise ValueError(f"Unknown document type: {document_type}")
+
+
+DOCUMENT_TYPES = ('DA', 'imbalance', 'FCR')
+
+
+#%% Rate limiting
+
+class RateLimiter:
+    """Sliding-window limiter: at most `requests_per_minute` calls in any 60 s window.
+
+    Thread-safe, so one instance can be shared by all workers of a pool.
+    """
+
+    def __init__(self, requests_per_minute=ENTSOE_REQUESTS_PER_MINUTE, period=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.period = period
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Block until a request slot is free, then claim it
+        if not self.requests_per_minute:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.period:
+                    self._calls.popleft()
+                if len(self._calls) < self.requests_per_minute:
+                    self._calls.append(now)
+                    return
+                wait = self.period - (now - self._calls[0])
+            time.sleep(wait)
+
+
+#%% Retries
+
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF = 2.0       # seconds, doubled on every retry
+MAX_BACKOFF = 120.0
+THROTTLE_WAIT = 60.0        # wait one full rate-limit window after HTTP 429
+MAX_THROTTLE_WAITS = 10
+
+
+def is_throttled(error):
+    """True for HTTP 429 Too Many Requests."""
+    response = getattr(error, 'response', None)
+    return response is not None and getattr(response, 'status_code', None) == 429
+
+
+def is_transient(error):
+    """True for errors worth retrying: timeouts, dropped connections and HTTP 5xx.
+
+    Other HTTP 4xx answers and entsoe-py's business errors (invalid
+    parameters, pagination) fail the same way every time.
+    """
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+        return True
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) if response is not None else None
+    return isinstance(error, requests.HTTPError) and status is not None and status >= 500
+
+
+def backoff_delay(attempt, backoff=DEFAULT_BACKOFF):
+    # Exponential backoff with jitter, so parallel workers do not retry in lockstep
+    delay = min(MAX_BACKOFF, backoff * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def call_with_retries(query, chunk_start, chunk_end, rate_limiter, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Call query(chunk_start, chunk_end), retrying transient errors.
+
+    NoMatchingDataError is raised immediately (there is nothing to retry).
+    HTTP 429 waits for Retry-After (or one rate-limit window) and does not use
+    up a retry; transient errors (is_transient) are retried `retries` times
+    with backoff. Anything else, such as HTTP 400/401 or an entsoe-py business
+    error, is raised at once so the chunk goes straight to the failed ledger.
+    """
+    attempt = 0
+    throttle_waits = 0
+    while True:
+        rate_limiter.acquire()
+        try:
+            return query(chunk_start, chunk_end)
+        except NoMatchingDataError:
+            raise
+        except Exception as e:
+            if is_throttled(e) and throttle_waits < MAX_THROTTLE_WAITS:
+                retry_after = e.response.headers.get('Retry-After')
+                wait = float(retry_after) if retry_after and retry_after.isdigit() else THROTTLE_WAIT
+                wait += random.uniform(0, 5)
+                throttle_waits += 1
+                print(f"Throttled (HTTP 429) for period {chunk_start} to {chunk_end}, waiting {wait:.0f} s")
+                time.sleep(wait)
+                continue
+            if attempt >= retries or not is_transient(e):
+                raise
+            wait = backoff_delay(attempt, backoff)
+            attempt += 1
+            print(f"Error for period {chunk_start} to {chunk_end}: {e}; retry {attempt}/{retries} in {wait:.1f} s")
+            time.sleep(wait)
+
+
+class FailedChunkLedger:
+    """JSON file of chunks that still failed after all retries, grouped by label (e.g. 'DA NL').
+
+    Chunks are removed again as soon as a later run fetches them successfully.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_FAILED_LEDGER
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(label, chunk_start, chunk_end):
+        return f"{label}|{chunk_start.isoformat()}|{chunk_end.isoformat()}"
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def record(self, label, chunk_start, chunk_end, error):
+        with self._lock:
+            key = self.key(label, chunk_start, chunk_end)
+            entry = self.entries.get(key, {'label': label, 'start': chunk_start.isoformat(),
+                                           'end': chunk_end.isoformat(), 'runs': 0})
+            entry['runs'] += 1
+            entry['error'] = f"{type(error).__name__}: {error}"
+            entry['kind'] = 'throttled' if is_throttled(error) else 'error'
+            entry['failed_at'] = pd.Timestamp.now(tz='UTC').isoformat()
+            self.entries[key] = entry
+            self._write()
+
+    def resolve(self, label, chunk_start, chunk_end):
+        with self._lock:
+            if self.entries.pop(self.key(label, chunk_start, chunk_end), None) is not None:
+                self._write()
+
+    def resolve_covered(self, label, fetched_chunks):
+        """Drop failed windows of label that are now fully covered by fetched_chunks (e.g. after a chunk size change)."""
+        fetched = sorted(fetched_chunks)
+        with self._lock:
+            resolved = []
+            for key, entry in self.entries.items():
+                if entry['label'] != label:
+                    continue
+                cursor, end = pd.Timestamp(entry['start']), pd.Timestamp(entry['end'])
+                for chunk_start, chunk_end in fetched:
+                    if chunk_start <= cursor < chunk_end:
+                        cursor = chunk_end
+                if cursor >= end:
+                    resolved.append(key)
+            for key in resolved:
+                del self.entries[key]
+            if resolved:
+                self._write()
+
+    def chunks(self, label, start=None, end=None):
+        """Failed (chunk_start, chunk_end) windows for label, optionally within [start, end)."""
+        chunks = []
+        for entry in self.entries.values():
+            if entry['label'] != label:
+                continue
+            chunk_start, chunk_end = pd.Timestamp(entry['start']), pd.Timestamp(entry['end'])
+            if start is not None and (chunk_end <= start or chunk_start >= end):
+                continue
+            if start is not None and chunk_start.tzinfo is not None and start.tzinfo is not None:
+                chunk_start, chunk_end = chunk_start.tz_convert(start.tz), chunk_end.tz_convert(start.tz)
+            chunks.append((chunk_start, chunk_end))
+        return sorted(chunks)
+
+
+#%% Progress ledger
+
+class ChunkLedger:
+    """Keeps every finished chunk on disk so an interrupted run resumes from the last good chunk.
+
+    Each chunk result is pickled to <ledger_dir>/<start>_<end>.pkl and listed
+    in <ledger_dir>/ledger.json. Chunks already in the ledger are loaded from
+    disk instead of being requested again.
+    """
+
+    def __init__(self, ledger_dir):
+        self.ledger_dir = ledger_dir
+        self.ledger_path = os.path.join(ledger_dir, 'ledger.json')
+        self._lock = threading.Lock()
+        os.makedirs(ledger_dir, exist_ok=True)
+        self.entries = {}
+        if os.path.exists(self.ledger_path):
+            with open(self.ledger_path) as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def chunk_key(chunk_start, chunk_end):
+        fmt = '%Y%m%dT%H%M%z'
+        return f"{chunk_start.strftime(fmt)}_{chunk_end.strftime(fmt)}"
+
+    def is_done(self, chunk_start, chunk_end):
+        key = self.chunk_key(chunk_start, chunk_end)
+        return key in self.entries and os.path.exists(os.path.join(self.ledger_dir, self.entries[key]['file']))
+
+    def done_chunks(self, start, end):
+        """(chunk_start, chunk_end) of all finished chunks that lie inside [start, end)."""
+        chunks = []
+        for key, entry in self.entries.items():
+            if not os.path.exists(os.path.join(self.ledger_dir, entry['file'])):
+                continue
+            chunk_start, chunk_end = (pd.Timestamp(datetime.datetime.strptime(part, '%Y%m%dT%H%M%z'))
+                                      for part in key.split('_'))
+            if start.tzinfo is not None:
+                chunk_start, chunk_end = chunk_start.tz_convert(start.tz), chunk_end.tz_convert(start.tz)
+            if chunk_start >= start and chunk_end <= end:
+                chunks.append((chunk_start, chunk_end))
+        return sorted(chunks)
+
+    def load(self, chunk_start, chunk_end):
+        entry = self.entries[self.chunk_key(chunk_start, chunk_end)]
+        return pd.read_pickle(os.path.join(self.ledger_dir, entry['file']))
+
+    def save(self, chunk_start, chunk_end, result):
+        key = self.chunk_key(chunk_start, chunk_end)
+        file_name = f'{key}.pkl'
+        tmp_path = os.path.join(self.ledger_dir, file_name + '.tmp')
+        result.to_pickle(tmp_path)
+        os.replace(tmp_path, os.path.join(self.ledger_dir, file_name))
+        with self._lock:
+            self.entries[key] = {'file': file_name, 'rows': len(result),
+                                 'fetched_at': pd.Timestamp.now(tz='UTC').isoformat()}
+            tmp_ledger = self.ledger_path + '.tmp'
+            with open(tmp_ledger, 'w') as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(tmp_ledger, self.ledger_path)
+
+
+#%% Adaptive chunk sizing
+
+# Per document type: (default window, smallest window, largest window).
+# ENTSO-E rejects requests over one year and query_day_ahead_prices_fast pads
+# the window by a day on each side, so DA/FCR windows stay at 363 days (365 padded).
+CHUNK_LIMITS = {
+    'DA': (pd.Timedelta(days=90), pd.Timedelta(days=7), pd.Timedelta(days=363)),
+    'imbalance': (pd.Timedelta(days=30), pd.Timedelta(days=1), pd.Timedelta(days=90)),
+    'FCR': (pd.Timedelta(days=90), pd.Timedelta(days=7), pd.Timedelta(days=363)),
+}
+DEFAULT_PLANNER_PATH = os.path.join('ledger', 'chunk_planner.json')
+
+
+class ChunkPlanner:
+    """Chooses the request window per document type from measured latency, payload and errors.
+
+    Every request is recorded (window, seconds, rows, error). The planner keeps
+    moving averages of seconds/day and rows/day plus an error rate, and sizes
+    the next window so a request takes about target_seconds and returns at
+    most max_rows rows. It halves the window after an error and grows by at
+    most 1.5x per step. Measurements are kept in ledger/chunk_planner.json so
+    the next run starts from what was learned.
+    """
+
+    def __init__(self, path=DEFAULT_PLANNER_PATH, target_seconds=10.0, max_rows=50000, alpha=0.3):
+        self.path = path
+        self.target_seconds = target_seconds
+        self.max_rows = max_rows
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.stats = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.stats = json.load(f)
+
+    def _limits(self, document_type):
+        return CHUNK_LIMITS.get(document_type, CHUNK_LIMITS['DA'])
+
+    def chunk_size(self, document_type):
+        default, smallest, largest = self._limits(document_type)
+        stats = self.stats.get(document_type)
+        if stats is None:
+            return default
+        # Clamp windows persisted under older limits
+        return min(max(pd.Timedelta(days=stats['window_days']), smallest), largest)
+
+    def record(self, document_type, window, seconds, rows, error=False):
+        default, smallest, largest = self._limits(document_type)
+        days = max(window / pd.Timedelta(days=1), 1 / 24)
+        with self._lock:
+            stats = self.stats.setdefault(document_type, {
+                'window_days': default / pd.Timedelta(days=1), 'seconds_per_day': None,
+                'rows_per_day': None, 'error_rate': 0.0, 'requests': 0})
+            a = self.alpha
+            stats['requests'] += 1
+            stats['error_rate'] = (1 - a) * stats['error_rate'] + a * (1.0 if error else 0.0)
+            current = stats['window_days']
+            if error:
+                new = current * 0.5
+            else:
+                for name, value in (('seconds_per_day', seconds / days), ('rows_per_day', rows / days)):
+                    stats[name] = value if stats[name] is None else (1 - a) * stats[name] + a * value
+                new = self.target_seconds / max(stats['seconds_per_day'], 1e-6)
+                if stats['rows_per_day']:
+                    new = min(new, self.max_rows / stats['rows_per_day'])
+                # Do not grow while requests keep failing; change by at most 1.5x per step
+                upper = current if stats['error_rate'] > 0.2 else current * 1.5
+                new = min(max(new, current * 0.5), upper)
+            new = min(max(new, smallest / pd.Timedelta(days=1)), largest / pd.Timedelta(days=1))
+            stats['window_days'] = round(new, 3)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.stats, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+_default_planner = None
+
+
+def get_default_planner():
+    """Planner shared by all chunked fetches in this process (loaded once from ledger/chunk_planner.json)."""
+    global _default_planner
+    if _default_planner is None:
+        _default_planner = ChunkPlanner()
+    return _default_planner
+
+
+#%% Chunked retrieval
+
+def make_chunks(start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split [start, end) into consecutive (chunk_start, chunk_end) windows."""
+    chunks = []
+    current_start = start
+    while current_start < end:
+        chunk_end = min(current_start + chunk_size, end)
+        chunks.append((current_start, chunk_end))
+        current_start = chunk_end
+    return chunks
+
+
+def timed_query(query, planner, document_type):
+    """Wrap query so every attempt reports its window, latency, rows and errors to the planner.
+
+    HTTP 429 is not recorded: being rate limited says nothing about the window size.
+    """
+    def timed(chunk_start, chunk_end):
+        t0 = time.monotonic()
+        try:
+            result = query(chunk_start, chunk_end)
+        except NoMatchingDataError:
+            raise
+        except Exception as e:
+            if is_throttled(e):
+                raise
+            planner.record(document_type, chunk_end - chunk_start, time.monotonic() - t0, 0, error=True)
+            raise
+        planner.record(document_type, chunk_end - chunk_start, time.monotonic() - t0, len(result))
+        return result
+    return timed
+
+
+def plan_chunks(start, end, chunk_size, done=()):
+    """Like make_chunks, but keeps already finished chunks and only splits the gaps between them.
+
+    This lets a resumed run reuse its ledger even when the chunk size changed in between.
+    """
+    chunks = []
+    cursor = start
+    for chunk_start, chunk_end in sorted(done):
+        if chunk_start < cursor:
+            continue
+        chunks += make_chunks(cursor, chunk_start, chunk_size)
+        chunks.append((chunk_start, chunk_end))
+        cursor = chunk_end
+    return chunks + make_chunks(cursor, end, chunk_size)
+
+
+def fetch_chunked(query, start, end, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1,
+                  requests_per_minute=ENTSOE_REQUESTS_PER_MINUTE, rate_limiter=None, ledger_dir=None,
+                  label=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                  failed_ledger_path=DEFAULT_FAILED_LEDGER, only_failed=False, return_failed=False,
+                  planner=None, document_type=None, on_chunk=None):
+    """Run query(chunk_start, chunk_end) for every chunk and concat the results in time order.
+
+    With max_workers > 1 the chunks are requested concurrently; every request
+    first takes a slot from the (shared) rate limiter. Errors are retried with
+    exponential backoff; chunks that still fail are left out of the result and
+    recorded under `label` in the failed-chunk ledger. With ledger_dir every
+    finished chunk is kept on disk and skipped when the same call is run again.
+
+    only_failed=True refetches only the chunks of `label` listed in the failed
+    ledger (other chunks are loaded from ledger_dir when available).
+    return_failed=True returns (result, failed_chunks).
+
+    With a planner, every request's latency, row count and errors are recorded
+    for `document_type`. chunk_size=None takes the window from the planner and
+    re-plans the rest of the range after every wave of max_workers chunks, so
+    the window adapts during a long run as well.
+
+    on_chunk(chunk_start, chunk_end, result) is called (from the worker
+    thread) for every newly fetched chunk, e.g. to append it to the store's
+    ingest log; chunks loaded from ledger_dir are not passed again.
+    """
+    adaptive = chunk_size is None and planner is not None and not only_failed
+    if chunk_size is None:
+        chunk_size = planner.chunk_size(document_type) if planner is not None else DEFAULT_CHUNK_SIZE
+    if planner is not None:
+        query = timed_query(query, planner, document_type)
+    if rate_limiter is None:
+        rate_limiter = RateLimiter(requests_per_minute)
+    ledger = ChunkLedger(ledger_dir) if ledger_dir else None
+    chunks = plan_chunks(start, end, chunk_size, ledger.done_chunks(start, end) if ledger else ())
+    failed_ledger = FailedChunkLedger(failed_ledger_path) if label and failed_ledger_path else None
+
+    if only_failed:
+        if failed_ledger is None:
+            raise ValueError("only_failed needs a label and a failed_ledger_path")
+        retry_chunks = failed_ledger.chunks(label, start, end)
+        print(f"Retrying {len(retry_chunks)} failed chunks for {label}")
+        if ledger is None:
+            chunks = retry_chunks
+        else:
+            # Failed ledger chunks may come from a different chunk size, so fetch them as they were recorded
+            chunks = sorted([c for c in chunks if ledger.is_done(*c)] + retry_chunks)
+
+    failed_chunks = []
+
+    def fetch_one(chunk):
+        chunk_start, chunk_end = chunk
+        if ledger is not None and ledger.is_done(chunk_start, chunk_end):
+            print(f"Loaded from ledger: {chunk_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')}")
+            return ledger.load(chunk_start, chunk_end)
+        try:
+            result = call_with_retries(query, chunk_start, chunk_end, rate_limiter, retries=retries, backoff=backoff)
+        except NoMatchingDataError:
+            # Valid request, ENTSO-E simply has nothing for this window: not a failure
+            print(f"No data for period {chunk_start} to {chunk_end}")
+            if failed_ledger is not None:
+                failed_ledger.resolve(label, chunk_start, chunk_end)
+            return None
+        except Exception as e:
+            reason = f"gave up after {retries} retries" if is_transient(e) else "permanent error, not retried"
+            print(f"Error for period {chunk_start} to {chunk_end} ({reason}): {e}")
+            failed_chunks.append(chunk)
+            if failed_ledger is not None:
+                failed_ledger.record(label, chunk_start, chunk_end, e)
+            return None
+        if ledger is not None:
+            ledger.save(chunk_start, chunk_end, result)
+        if on_chunk is not None:
+            on_chunk(chunk_start, chunk_end, result)
+        if failed_ledger is not None:
+            failed_ledger.resolve(label, chunk_start, chunk_end)
+        print(f"Retrieved: {chunk_start.strftime('%Y-%m-%d')} to {chunk_end.strftime('%Y-%m-%d')}")
+        return result
+
+    def fetch_all(batch):
+        if max_workers > 1 and len(batch) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(batch))) as pool:
+                # pool.map keeps the input order, so the chunks come back in time order
+                return list(pool.map(fetch_one, batch))
+        return [fetch_one(chunk) for chunk in batch]
+
+    if adaptive:
+        done = ledger.done_chunks(start, end) if ledger else ()
+        chunks, results, cursor = [], [], start
+        while cursor < end:
+            window = planner.chunk_size(document_type)
+            if window != chunk_size:
+                print(f"Chunk window now {window / pd.Timedelta(days=1):g} days")
+                chunk_size = window
+            wave = plan_chunks(cursor, end, window, done)[:max(max_workers, 1)]
+            chunks += wave
+            results += fetch_all(wave)
+            cursor = wave[-1][1]
+    else:
+        results = fetch_all(chunks)
+
+    if failed_ledger is not None:
+        failed_ledger.resolve_covered(label, [c for c, r in zip(chunks, results) if c not in failed_chunks])
+    if failed_chunks:
+        print(f"{len(failed_chunks)} chunks failed"
+              + (f" and were written to {failed_ledger_path}; rerun with --retry-failed" if failed_ledger else ""))
+
+    if planner is not None:
+        planner.save()
+
+    results = [r for r in results if r is not None]
+    result = pd.concat(results) if results else pd.DataFrame()
+    if return_failed:
+        return result, sorted(failed_chunks)
+    return result
+
+
+def get_da_prices_chunked(client, country_code, start, end, chunk_size=None,
+                          max_workers=1, fast_parse=False, **fetch_kwargs):
+    """Retrieve Day-Ahead prices in chunks, optionally several chunks in parallel.
+
+    The window comes from the shared ChunkPlanner (90 days until it has
+    measurements) unless chunk_size is given. fast_parse=True parses the raw
+    A44 XML with entsoe_parse instead of entsoe-py's BeautifulSoup parser.
+    Extra keyword arguments (requests_per_minute, ledger_dir, retries,
+    only_failed, return_failed, ...) are passed on to fetch_chunked().
+    """
+    planner = fetch_kwargs.setdefault('planner', get_default_planner())
+    fetch_kwargs.setdefault('document_type', 'DA')
+    # Without chunk_size the planner picks the window and fetch_chunked re-plans it as requests complete
+    adaptive = chunk_size is None and planner is not None
+    if chunk_size is None:
+        chunk_size = planner.chunk_size('DA') if planner is not None else DEFAULT_CHUNK_SIZE
+    print(f"Starting to retrieve Day-Ahead prices in {chunk_size / pd.Timedelta(days=1):g}-day chunks ({max_workers} workers):")
+
+    def query(chunk_start, chunk_end):
+        if fast_parse:
+            return query_day_ahead_prices_fast(client, country_code, chunk_start, chunk_end)
+        return client.query_day_ahead_prices(country_code, start=chunk_start, end=chunk_end)
+
+    fetch_kwargs.setdefault('label', f'DA {country_code}')
+    prices = fetch_chunked(query, start, end, chunk_size=None if adaptive else chunk_size, max_workers=max_workers,
+                          **fetch_kwargs)
+    result = prices[0] if fetch_kwargs.get('return_failed') else prices
+    if len(result):
+        # entsoe-py returns both chunk boundaries (neighbouring chunks share one row) and the row at `end`
+        result = result[~result.index.duplicated(keep='last')].sort_index()
+        result = result[result.index < end]
+    if len(result):
+        # PT60M before the 15-min MTU go-live, PT15M after; later stages read it from the timestamps the same way
+        print(f"DA {country_code} resolution: "
+              f"{describe_resolutions(resolution_runs(to_epoch_seconds(result.index)), start.tz or 'UTC')}")
+    print("\n")
+    if fetch_kwargs.get('return_failed'):
+        return result, prices[1]
+    return result
+
+
+def get_imbalance_prices_chunked(client, country_code, start, end, chunk_size=None,
+                                 max_workers=1, **fetch_kwargs):
+    """Retrieve 15-min imbalance prices (Long/Short) in chunks, optionally in parallel and resumable.
+
+    Pass ledger_dir (one directory per zone/period) to keep finished chunks on
+    disk; rerunning after an interruption only requests the missing chunks.
+    The window comes from the shared ChunkPlanner (30 days until it has
+    measurements) unless chunk_size is given.
+    """
+    planner = fetch_kwargs.setdefault('planner', get_default_planner())
+    fetch_kwargs.setdefault('document_type', 'imbalance')
+    # Without chunk_size the planner picks the window and fetch_chunked re-plans it as requests complete
+    adaptive = chunk_size is None and planner is not None
+    if chunk_size is None:
+        chunk_size = planner.chunk_size('imbalance') if planner is not None else IMBALANCE_CHUNK_SIZE
+    print(f"Starting to retrieve imbalance prices in {chunk_size / pd.Timedelta(days=1):g}-day chunks ({max_workers} workers):")
+
+    def query(chunk_start, chunk_end):
+        return client.query_imbalance_prices(country_code, start=chunk_start, end=chunk_end, psr_type=None)
+
+    fetch_kwargs.setdefault('label', f'imbalance {country_code}')
+    imb = fetch_chunked(query, start, end, chunk_size=None if adaptive else chunk_size, max_workers=max_workers,
+                        **fetch_kwargs)
+    print("\n")
+    if fetch_kwargs.get('return_failed'):
+        imb, failed_chunks = imb
+        return imb[~imb.index.duplicated(keep='last')], failed_chunks
+    # entsoe-py returns both chunk boundaries, so neighbouring chunks share one row
+    return imb[~imb.index.duplicated(keep='last')]
+
+
+#%% Incremental update of the per-year CSV files
+
+# SDAC day-ahead results for tomorrow are published around 12:45 CET
+DA_PUBLICATION_HOUR = 13
+
+
+def latest_published_da_end(now=None, tz='Europe/Brussels'):
+    """End (exclusive) of the latest day-ahead auction that should be published at `now`."""
+    now = pd.Timestamp.now(tz=tz) if now is None else now.tz_convert(tz)
+    tomorrow = now.normalize() + pd.Timedelta(days=1)
+    if now.hour >= DA_PUBLICATION_HOUR:
+        return tomorrow + pd.Timedelta(days=1)
+    return tomorrow
+
+
+def read_last_rows(file_path, n=2, block_size=4096):
+    """Return the last n data lines of a text file without reading the whole file."""
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        data = b''
+        while size > 0 and data.count(b'\n') <= n + 1:
+            step = min(block_size, size)
+            size -= step
+            f.seek(size)
+            data = f.read(step) + data
+    lines = [line for line in data.decode('utf-8').splitlines() if line.strip()]
+    # drop the header if the file is (almost) empty
+    return [line for line in lines[-n:] if not line.startswith('time,')]
+
+
+def update_da_prices_csv(client, country_code, file_path, year, tz='Europe/Brussels', now=None, **fetch_kwargs):
+    """Append only the missing intervals to data/DA_prices_{year}.csv.
+
+    Reads the last stored timestamp, requests [last + step, latest published
+    auction) within the year and atomically replaces the file with the old
+    rows plus the new ones. Creates the file when it does not exist yet.
+    Returns the number of rows added.
+    """
+    year_start = pd.Timestamp(f'{year}-01-01 00:00:00', tz=tz)
+    fetch_end = min(pd.Timestamp(f'{year + 1}-01-01 00:00:00', tz=tz), latest_published_da_end(now, tz))
+
+    last_time = None
+    fetch_start = year_start
+    if os.path.exists(file_path):
+        last_rows = read_last_rows(file_path)
+        if last_rows:
+            times = [pd.Timestamp(row.split(',')[0]).tz_convert(tz) for row in last_rows]
+            last_time = times[-1]
+            step = times[-1] - times[-2] if len(times) == 2 else pd.Timedelta(hours=1)
+            if step <= pd.Timedelta(0):
+                step = pd.Timedelta(hours=1)  # duplicated boundary row
+            fetch_start = last_time + step
+
+    if fetch_start >= fetch_end:
+        if last_time is not None:
+            print(f"{file_path} is up to date (last timestamp {last_time})")
+        return 0
+
+    print(f"Updating {file_path}: fetching {fetch_start} to {fetch_end}")
+    DA, failed_chunks = get_da_prices_chunked(client, country_code, fetch_start, fetch_end,
+                                              return_failed=True, **fetch_kwargs)
+    if failed_chunks:
+        # Only append up to the first failed chunk, so the next update resumes there instead of leaving a hole
+        fetch_end = failed_chunks[0][0]
+    if len(DA) == 0:
+        print(f"No new data published yet for {file_path}")
+        return 0
+    if isinstance(DA, pd.DataFrame):
+        DA = DA.iloc[:, 0]
+    DA = DA[~DA.index.duplicated(keep='last')].sort_index()
+    if last_time is not None:
+        DA = DA[DA.index > last_time]
+    DA = DA[DA.index < fetch_end]
+    if len(DA) == 0:
+        return 0
+
+    new_rows = pd.DataFrame({'time': DA.index, 'DA_price': DA.values})
+    # Write old content + new rows to a temp file and swap it in, so readers never see a half-written file
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', newline='') as out:
+        if last_time is not None:
+            with open(file_path, 'r', newline='') as src:
+                content = src.read()
+            out.write(content)
+            if content and not content.endswith('\n'):
+                out.write('\n')
+            new_rows.to_csv(out, index=False, header=False)
+        else:
+            new_rows.to_csv(out, index=False)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, file_path)
+    print(f"Appended {len(new_rows)} rows to {file_path}")
+    return len(new_rows)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped fixed-resolution price arrays with O(1) timestamp lookup.
+
+DA prices (hourly, 15-min since the go-live) and 15-min imbalance prices
+are regular grids, so each zone / dataset / column / resolution is stored as
+one flat float32 array behind a 64-byte header holding the epoch origin and the step in seconds. The price of
+any timestamp is values[(epoch - origin) // step]; NaN marks gaps. The file is
+opened with np.memmap, so a lookup or a window slice needs no parsing and no
+copy, and the OS page cache shares the data between processes.
+
+Files: data/grid/{dataset}_{zone}_{column}_{step}s.f32
+
+Usage:
+    from entsoe_grid import build_grid_from_store, PriceGrid
+    build_grid_from_store('imbalance', 'NL', 'Short', step=900)
+    grid = PriceGrid.open('data/grid/imbalance_NL_Short_900s.f32')
+    grid.at(pd.Timestamp('2024-06-01 12:15', tz='Europe/Amsterdam'))
+    grid.lookup(epoch_array)                 # vectorised, millions of lookups
+@author: Mayk Thewessen
+"""
+
+import argparse
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+
+GRID_DIR = os.path.join('data', 'grid')
+MAGIC = b'ENTSOGRD'
+VERSION = 1
+HEADER_FORMAT = '<8sIIqq'  # magic, version, step [s], origin [UTC epoch s], length
+HEADER_SIZE = 64
+DTYPE = np.float32
+DEFAULT_TZ = 'Europe/Amsterdam'
+
+
+def grid_path(dataset, zone, column, step, grid_dir=GRID_DIR):
+    return os.path.join(grid_dir, f'{dataset}_{zone}_{column}_{step}s.f32')
+
+
+def _to_epoch(value):
+    # ints are UTC epoch seconds, naive timestamps are local (DEFAULT_TZ) like in entsoe_store
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    value = pd.Timestamp(value)
+    if value.tz is None:
+        value = value.tz_localize(DEFAULT_TZ)
+    return int(value.timestamp())
+
+
+def _write_header(f, step, origin, length):
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, step, origin, length)
+    f.seek(0)
+    f.write(header.ljust(HEADER_SIZE, b'\0'))
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        magic, version, step, origin, length = struct.unpack_from(HEADER_FORMAT, f.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a price grid file")
+    if version != VERSION:
+        raise ValueError(f"{path} has grid format version {version}, expected {VERSION}")
+    return step, origin, length
+
+
+class PriceGrid:
+    """Read view of one grid file: values is a float32 np.memmap, slot i is origin + i * step."""
+
+    def __init__(self, path, step, origin, values):
+        self.path = path
+        self.step = step
+        self.origin = origin
+        self.values = values
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        step, origin, length = read_header(path)
+        values = np.memmap(path, dtype=DTYPE, mode=mode, offset=HEADER_SIZE, shape=(length,))
+        return cls(path, step, origin, values)
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def end(self):
+        """Epoch (exclusive) of the last slot."""
+        return self.origin + len(self.values) * self.step
+
+    def index_of(self, epoch):
+        return (np.asarray(epoch, dtype=np.int64) - self.origin) // self.step
+
+    def at(self, timestamp):
+        """Price at one timestamp (epoch seconds or anything pd.Timestamp accepts); NaN outside the grid."""
+        i = (_to_epoch(timestamp) - self.origin) // self.step
+        if 0 <= i < len(self.values):
+            return float(self.values[i])
+        return float('nan')
+
+    def lookup(self, epoch):
+        """Vectorised at() for an array of UTC epoch seconds."""
+        i = self.index_of(epoch)
+        inside = (i >= 0) & (i < len(self.values))
+        out = np.full(i.shape, np.nan, dtype=DTYPE)
+        out[inside] = self.values[i[inside]]
+        return out
+
+    def window(self, start, end):
+        """Zero-copy view of the slots in [start, end), clipped to the grid, plus the epoch of its first slot."""
+        first = max((_to_epoch(start) - self.origin) // self.step, 0)
+        last = min(-(-(_to_epoch(end) - self.origin) // self.step), len(self.values))
+        last = max(last, first)
+        return self.values[first:last], self.origin + first * self.step
+
+    def to_series(self, start=None, end=None, tz=DEFAULT_TZ):
+        values, first = self.window(self.origin if start is None else start, self.end if end is None else end)
+        epoch = first + self.step * np.arange(len(values), dtype=np.int64)
+        index = pd.DatetimeIndex(pd.to_datetime(epoch, unit='s', utc=True)).tz_convert(tz)
+        return pd.Series(np.asarray(values), index=index, name=os.path.basename(self.path))
+
+
+def write_grid(path, epoch, values, step, hold=None):
+    """Put (epoch, value) points into the grid file at path, creating or growing it as needed.
+
+    Points that are not on the step grid are skipped. hold (seconds, default
+    step) is how long each value is valid: an hourly price written into a
+    900 s grid with hold=3600 fills all four quarter-hours. Returns the number
+    of slots written.
+    """
+    epoch = np.asarray(epoch, dtype=np.int64)
+    values = np.asarray(values, dtype=DTYPE)
+    repeat = max((hold or step) // step, 1)
+    if repeat > 1:
+        epoch = (epoch[:, None] + step * np.arange(repeat, dtype=np.int64)).ravel()
+        values = np.repeat(values, repeat)
+    if len(epoch) == 0:
+        return 0
+
+    if os.path.exists(path):
+        old_step, origin, length = read_header(path)
+        if old_step != step:
+            raise ValueError(f"{path} has step {old_step} s, not {step} s")
+    else:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        origin, length = int(epoch.min()) - int(epoch.min()) % step, 0
+        with open(path, 'wb') as f:
+            _write_header(f, step, origin, 0)
+
+    on_grid = (epoch - origin) % step == 0
+    if not on_grid.all():
+        print(f"Skipped {int((~on_grid).sum())} points that are not on the {step} s grid of {path}")
+        epoch, values = epoch[on_grid], values[on_grid]
+    if len(epoch) == 0:
+        return 0
+
+    if epoch.min() < origin:
+        # Data before the origin: rewrite the file with an earlier origin (rare, e.g. backfilling older years)
+        shift = (origin - int(epoch.min())) // step
+        old = np.fromfile(path, dtype=DTYPE, offset=HEADER_SIZE, count=length)
+        origin -= shift * step
+        length += shift
+        with open(path + '.tmp', 'wb') as f:
+            _write_header(f, step, origin, length)
+            np.full(shift, np.nan, dtype=DTYPE).tofile(f)
+            old.tofile(f)
+        os.replace(path + '.tmp', path)
+
+    new_length = max(length, int((epoch.max() - origin) // step) + 1)
+    if new_length > length:
+        with open(path, 'r+b') as f:
+            f.truncate(HEADER_SIZE + new_length * np.dtype(DTYPE).itemsize)
+            _write_header(f, step, origin, new_length)
+    grid = np.memmap(path, dtype=DTYPE, mode='r+', offset=HEADER_SIZE, shape=(new_length,))
+    if new_length > length:
+        grid[length:] = np.nan  # the grown part of the file is zeros, which are not gaps
+    # With hold, a later point overwrites the held slots of the previous one (numpy assigns in order)
+    grid[(epoch - origin) // step] = values
+    grid.flush()
+    del grid
+    return len(epoch)
+
+
+def build_grid_from_store(dataset, zone, column, step, hold=None, grid_dir=GRID_DIR, **store_kwargs):
+    """Write one column of the Parquet store (entsoe_store) into its grid file and return the file path.
+
+    Without hold, every stored point covers its own resolution (see
+    entsoe_align): hourly DA fills four slots of a 900 s grid, 15-min DA after
+    the go-live gives the time-weighted hourly mean on a 3600 s grid, and
+    slots that are not fully covered stay NaN.
+    """
+    from entsoe_align import align_to_grid, point_durations
+    from entsoe_store import read_store
+
+    arrays = read_store(dataset, zone, columns=[column], as_arrays=True, **store_kwargs)
+    path = grid_path(dataset, zone, column, step, grid_dir)
+    if not arrays:
+        print(f"No {dataset} data for {zone} in the store")
+        return path
+    if hold is None:
+        epoch = np.sort(arrays['timestamp'])
+        origin = int(epoch[0]) // step * step
+        length = -(-(int(epoch[-1] + point_durations(epoch)[-1]) - origin) // step)
+        values, present, _ = align_to_grid(arrays['timestamp'], arrays[column], origin, step, length)
+        slots = np.flatnonzero(present)
+        written = write_grid(path, origin + step * slots, values[slots], step)
+    else:
+        written = write_grid(path, arrays['timestamp'], arrays[column], step, hold=hold)
+    print(f"Wrote {written} slots to {path}")
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build memory-mapped price grids from the Parquet store")
+    parser.add_argument('--zones', nargs='+', default=['NL'])
+    args = parser.parse_args()
+
+    for zone in args.zones:
+        build_grid_from_store('DA', zone, 'DA_price', step=3600)
+        # DA on the 15-min grid as well, so it lines up slot by slot with imbalance prices
+        build_grid_from_store('DA', zone, 'DA_price', step=900)
+        build_grid_from_store('imbalance', zone, 'Long', step=900)
+        build_grid_from_store('imbalance', zone, 'Short', step=900)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fast loader for the price CSVs (data/DA_prices_{year}.csv, outfile_*).
+
+The analysis scripts used to read every year with pd.read_csv and then run
+pd.to_datetime(df['time'], utc=True).dt.tz_convert(...) over all rows, which
+parses each "2024-01-01 00:00:00+01:00" string element by element. Here the
+files are read with pyarrow's multithreaded CSV reader and a fixed schema:
+the offset-aware timestamps are parsed in C++ straight into UTC
+timestamp[s], prices into float64, and several years are read in parallel.
+The result gets a tz-aware index by a vectorised tz_convert only.
+
+Years before and after the 15-min DA go-live (2025-10-01) mix PT60M and
+PT15M rows; load_da_prices() adds the hours each row covers, so averages and
+histograms can weight by time, or rolls everything up to hourly on the fly.
+
+Usage:
+    from entsoe_load import load_da_prices, read_price_csv
+    df = load_da_prices([2019, 2020, 2021, 2022, 2023, 2024, 2025], data_dir)
+    df_hourly = load_da_prices(years, data_dir, hourly=True)   # 15-min years as hourly means
+@author: Mayk Thewessen
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+
+DEFAULT_TZ = 'Europe/Amsterdam'
+UTC_SECONDS = pa.timestamp('s', tz='UTC')
+# Fixed schema of data/DA_prices_{year}.csv
+DA_COLUMN_TYPES = {'time': UTC_SECONDS, 'DA_price': pa.float64()}
+
+
+def read_price_csv(file_path, time_column=None, tz=DEFAULT_TZ, column_types=None):
+    """Read one price CSV into a DataFrame indexed by tz-aware time.
+
+    time_column defaults to the first column (also when it has no name, as in
+    outfile_imb_15min_*). column_types maps further columns to pyarrow types;
+    columns not listed are inferred.
+    """
+    if time_column is None:
+        with open(file_path, 'r') as f:
+            time_column = f.readline().rstrip('\r\n').split(',')[0]
+    types = {time_column: UTC_SECONDS}
+    types.update(column_types or {})
+    try:
+        table = pv.read_csv(file_path, convert_options=pv.ConvertOptions(column_types=types))
+    except pa.ArrowInvalid:
+        # Timestamps in a format Arrow does not parse: fall back to pandas once for this file
+        df = pd.read_csv(file_path)
+        index = pd.to_datetime(df.pop(time_column), format='ISO8601', utc=True)
+        return df.set_index(pd.DatetimeIndex(index, name='time').tz_convert(tz))
+    df = table.to_pandas()
+    index = pd.DatetimeIndex(df.pop(time_column), name='time').tz_convert(tz)
+    return df.set_index(index)
+
+
+def load_da_prices(years, data_dir='data', tz=DEFAULT_TZ, max_workers=None, file_pattern='DA_prices_{year}.csv',
+                   hourly=False):
+    """Read the per-year DA CSVs in parallel.
+
+    Returns one DataFrame with columns time (tz-aware), DA_price, year and
+    hours, in year order: the layout the EPEX scripts built with read_csv +
+    to_datetime, plus the hours each row covers (1.0 hourly, 0.25 for 15-min
+    MTUs) for time-weighted statistics. hourly=True rolls 15-min rows up to
+    hourly time-weighted means (incomplete hours are dropped). Missing years
+    are skipped with a message.
+    """
+    from entsoe_align import duration_hours, rollup
+
+    paths = {year: os.path.join(data_dir, file_pattern.format(year=year)) for year in years}
+    missing = [year for year, path in paths.items() if not os.path.exists(path)]
+    for year in missing:
+        print(f"No data file for {year}: {paths[year]}")
+    paths = {year: path for year, path in paths.items() if year not in missing}
+    if not paths:
+        return pd.DataFrame(columns=['time', 'DA_price', 'year', 'hours'])
+
+    def load(item):
+        year, path = item
+        df = read_price_csv(path, 'time', tz, column_types=DA_COLUMN_TYPES)
+        if hourly:
+            df = rollup(df['DA_price']).to_frame()
+        df = df.reset_index()
+        df['year'] = year
+        df['hours'] = duration_hours(df['time'])
+        return df
+
+    # pyarrow releases the GIL while parsing, so threads read the files in parallel
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(paths), os.cpu_count() or 1)) as pool:
+        frames = list(pool.map(load, paths.items()))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the ENTSO-E transparency API, for offline fetch benchmarks.
+
+MockEntsoeServer answers the same GET requests as web-api.tp.entsoe.eu:
+A44 day-ahead prices, A85 imbalance prices (ZIP) and A81 contracted FCR
+reserve prices (ZIP). Responses are replayed from a recorded response cache
+(entsoe_cache, e.g. cache/entsoe) when the request is in there, otherwise a
+deterministic synthetic document is generated. Latency, injected 503 errors
+and a 429 rate limit are configurable, so concurrency and chunk sizes can be
+tuned without touching the API quota.
+
+run_benchmark() runs get_da_prices_chunked / get_imbalance_prices_chunked
+workloads against the server and reports wall time and requests/s.
+
+Usage:
+    python entsoe_mock.py --serve --port 8765        # then ENTSOE_ENDPOINT_URL=http://127.0.0.1:8765/api
+    python entsoe_mock.py --workers 1 4 8 --chunk-days 30 90 --latency 0.3 --error-rate 0.02
+@author: Mayk Thewessen
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+from entsoe_cache import ResponseCache
+from entsoe_clients import DEFAULT_POOL_SIZE, set_endpoint_url
+from entsoe_parse import QUARTER_MTU_SDAC_GOLIVE
+
+
+PAGE_SIZE = 100
+NO_DATA_TEXT = 'No matching data found for Data item'
+GOLIVE_EPOCH = int(QUARTER_MTU_SDAC_GOLIVE.timestamp())
+
+
+#%% Synthetic documents
+
+def synthetic_prices(epoch, seed=0):
+    """Deterministic price curve (EUR/MWh) for UTC epoch seconds: daily and yearly shape plus noise."""
+    hours = epoch / 3600.0
+    noise = np.sin(epoch * 12.9898 + seed * 78.233) * 43758.5453
+    noise = (noise - np.floor(noise)) - 0.5
+    return np.round(70 + 35 * np.sin(2 * np.pi * (hours % 24 - 9) / 24)
+                    + 15 * np.cos(2 * np.pi * hours / 8766) + 40 * noise, 2)
+
+
+def day_periods(start, end):
+    """Split [start, end) epoch seconds into periods of at most one day."""
+    periods = []
+    while start < end:
+        periods.append((start, min(start + 86400, end)))
+        start += 86400
+    return periods
+
+
+def iso(epoch):
+    return time.strftime('%Y-%m-%dT%H:%MZ', time.gmtime(epoch))
+
+
+def period_xml(start, end, step, resolution, point_xml):
+    epoch = start + step * np.arange((end - start) // step, dtype=np.int64)
+    points = ''.join(point_xml(i + 1, t) for i, t in enumerate(epoch))
+    return (f'<Period><timeInterval><start>{iso(start)}</start><end>{iso(end)}</end></timeInterval>'
+            f'<resolution>{resolution}</resolution>{points}</Period>')
+
+
+def a44_series(start, end):
+    series = []
+    for s, e in day_periods(start, end):
+        step, resolution = (900, 'PT15M') if s >= GOLIVE_EPOCH else (3600, 'PT60M')
+        prices = dict(zip(range(s, e, step), synthetic_prices(np.arange(s, e, step))))
+        body = period_xml(s, e, step, resolution,
+                          lambda pos, t: f'<Point><position>{pos}</position><price.amount>{prices[t]}</price.amount></Point>')
+        series.append(f'<TimeSeries><businessType>A62</businessType><curveType>A01</curveType>{body}</TimeSeries>')
+    return series
+
+
+def a85_series(start, end):
+    # One TimeSeries per price category (A04 long, A05 short) holding one Period per day
+    periods = day_periods(start, end)
+    da = dict(zip(range(start, periods[-1][1], 900), synthetic_prices(np.arange(start, periods[-1][1], 900))))
+    series = []
+    for category, sign in (('A04', -1), ('A05', 1)):
+        body = ''.join(period_xml(s, e, 900, 'PT15M', lambda pos, t: (
+            f'<Point><position>{pos}</position><imbalance_Price.amount>{da[t] + sign * 25:.2f}</imbalance_Price.amount>'
+            f'<imbalance_Price.category>{category}</imbalance_Price.category></Point>')) for s, e in periods)
+        series.append(f'<TimeSeries><businessType>A19</businessType><curveType>A01</curveType>{body}</TimeSeries>')
+    return series
+
+
+def a81_series(start, end):
+    series = []
+    for s, e in day_periods(start, end):
+        fcr = dict(zip(range(s, e, 3600), np.abs(synthetic_prices(np.arange(s, e, 3600), seed=1)) / 4))
+        body = period_xml(s, e, 3600, 'PT60M', lambda pos, t: (
+            f'<Point><position>{pos}</position><quantity>110</quantity>'
+            f'<procurement_Price.amount>{fcr[t]:.2f}</procurement_Price.amount></Point>'))
+        series.append('<TimeSeries><businessType>B95</businessType><type_MarketAgreement.type>A01</type_MarketAgreement.type>'
+                      f'<flowDirection.direction>A03</flowDirection.direction><curveType>A01</curveType>{body}</TimeSeries>')
+    return series
+
+
+# documentType -> (root element, TimeSeries generator, zipped like the real API)
+DOCUMENTS = {
+    'A44': ('Publication_MarketDocument', a44_series, False),
+    'A85': ('Balancing_MarketDocument', a85_series, True),
+    'A81': ('Balancing_MarketDocument', a81_series, True),
+}
+
+
+def acknowledgement(text):
+    return (f'<?xml version="1.0" encoding="UTF-8"?><Acknowledgement_MarketDocument>'
+            f'<Reason><code>999</code><text>{text}</text></Reason></Acknowledgement_MarketDocument>').encode()
+
+
+def synthetic_response(params):
+    """Return (status, content_type, body) for the request parameters."""
+    document = DOCUMENTS.get(params.get('documentType'))
+    if document is None:
+        return 400, 'application/xml', acknowledgement(f"Mock server has no documentType {params.get('documentType')}")
+    root, make_series, zipped = document
+    start = int(pd.Timestamp(params['periodStart'], tz='UTC').timestamp())
+    end = int(pd.Timestamp(params['periodEnd'], tz='UTC').timestamp())
+    offset = int(params.get('offset', 0))
+    series = make_series(start, end)[offset:offset + PAGE_SIZE]
+    if not series:
+        return 200, 'application/xml', acknowledgement(NO_DATA_TEXT)
+    process = f"<process.processType>{params['processType']}</process.processType>" if 'processType' in params else ''
+    xml = (f'<?xml version="1.0" encoding="UTF-8"?><{root} xmlns="urn:iec62325.351:tc57wg16:451-mock">'
+           f'{process}{"".join(series)}</{root}>').encode()
+    if not zipped:
+        return 200, 'text/xml', xml
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f"{params['documentType']}_{offset}.xml", xml)
+    return 200, 'application/zip', buffer.getvalue()
+
+
+#%% Server
+
+class MockEntsoeServer:
+    """Threaded HTTP server that mimics the ENTSO-E API; start() runs it in a background thread.
+
+    latency: base seconds per response, jitter: extra uniform random seconds,
+    error_rate: share of requests answered with 503, requests_per_minute:
+    sliding-window limit above which requests get 429 + Retry-After (by
+    default the seconds until the window has room again),
+    fixtures_dir: response cache directory to replay recorded responses from.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 requests_per_minute=None, retry_after=None, fixtures_dir=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.retry_after = retry_after
+        self.fixtures = ResponseCache(fixtures_dir, max_bytes=float('inf')) if fixtures_dir else None
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'served': 0, 'fixtures': 0, 'errors': 0, 'throttled': 0, 'no_data': 0}
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/api'
+
+    def _admit(self):
+        # Returns (reason, retry_after) for a rejected request, or (None, None) to serve it
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.requests_per_minute:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= 60:
+                    self._calls.popleft()
+                if len(self._calls) >= self.requests_per_minute:
+                    self.stats['throttled'] += 1
+                    wait = self.retry_after or max(1, int(60 - (now - self._calls[0])) + 1)
+                    return 'throttled', wait
+                self._calls.append(now)
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 'error', None
+            return None, None
+
+    def respond(self, params):
+        """Return (status, headers, body) for one request."""
+        rejected, retry_after = self._admit()
+        if rejected == 'throttled':
+            return 429, {'Retry-After': str(retry_after), 'Content-Type': 'application/xml'}, \
+                acknowledgement('Max allowed requests per minute from each unique IP is exceeded')
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.random.uniform(0, self.jitter))
+        if rejected == 'error':
+            return 503, {'Content-Type': 'application/xml'}, acknowledgement('Service temporarily unavailable (injected)')
+
+        recorded = self.fixtures.get(params) if self.fixtures is not None else None
+        if recorded is not None:
+            content, meta = recorded
+            status, content_type, body = 200, meta.get('content_type') or 'text/xml', content
+            with self._lock:
+                self.stats['fixtures'] += 1
+        else:
+            status, content_type, body = synthetic_response(params)
+        with self._lock:
+            self.stats['served'] += 1
+            if NO_DATA_TEXT.encode() in body[:500]:
+                self.stats['no_data'] += 1
+        return status, {'Content-Type': content_type}, body
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def do_GET(self):
+                params = dict(parse_qsl(urlparse(self.path).query))
+                status, headers, body = server.respond(params)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+            self._calls.clear()
+
+
+#%% Benchmark harness
+
+def make_bench_client():
+    # Pooled session without the response cache, so every run measures real requests
+    import requests
+    from entsoe import EntsoePandasClient
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DEFAULT_POOL_SIZE, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return EntsoePandasClient(api_key='mock', session=session)
+
+
+def run_benchmark(server, workloads, workers=(1, 4, 8), chunk_days=(30, 90),
+                  country_code='NL', requests_per_minute=None, retries=2, backoff=0.1):
+    """Run every workload for each workers x chunk_days combination and return a results DataFrame.
+
+    workloads is a list of (name, start, end); name is 'DA', 'DA_fast' or 'imbalance'.
+    """
+    from entsoe_fetch import ENTSOE_REQUESTS_PER_MINUTE, get_da_prices_chunked, get_imbalance_prices_chunked
+
+    set_endpoint_url(server.url)
+    client = make_bench_client()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, start, end in workloads:
+            for days in chunk_days:
+                for max_workers in workers:
+                    server.reset_stats()
+                    kwargs = dict(chunk_size=pd.Timedelta(days=days), max_workers=max_workers, planner=None,
+                                  requests_per_minute=requests_per_minute or ENTSOE_REQUESTS_PER_MINUTE,
+                                  retries=retries, backoff=backoff, return_failed=True,
+                                  failed_ledger_path=os.path.join(tmp, 'failed_chunks.json'))
+                    t0 = time.perf_counter()
+                    if name == 'imbalance':
+                        result, failed = get_imbalance_prices_chunked(client, country_code, start, end, **kwargs)
+                    else:
+                        result, failed = get_da_prices_chunked(client, country_code, start, end,
+                                                               fast_parse=(name == 'DA_fast'), **kwargs)
+                    wall = time.perf_counter() - t0
+                    stats = dict(server.stats)
+                    rows.append({'workload': name, 'chunk_days': days, 'workers': max_workers,
+                                 'wall_s': round(wall, 3), 'requests': stats['requests'],
+                                 'requests_per_s': round(stats['requests'] / wall, 1) if wall else float('nan'),
+                                 'rows': len(result), 'failed_chunks': len(failed),
+                                 'errors': stats['errors'], 'throttled': stats['throttled'],
+                                 'fixtures': stats['fixtures']})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local ENTSO-E mock server and fetch benchmark")
+    parser.add_argument('--serve', action='store_true', help="only run the server until Ctrl-C")
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.2, help="seconds per response")
+    parser.add_argument('--jitter', type=float, default=0.1, help="extra random seconds per response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument('--server-rpm', type=int, default=None, help="server-side limit; above it requests get 429")
+    parser.add_argument('--fixtures', default=None, help="response cache directory to replay, e.g. cache/entsoe")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--chunk-days', type=int, nargs='+', default=[30, 90])
+    parser.add_argument('--workloads', nargs='+', default=['DA_fast', 'imbalance'], choices=['DA', 'DA_fast', 'imbalance'])
+    parser.add_argument('--start', default='2024-01-01')
+    parser.add_argument('--end', default='2025-01-01')
+    parser.add_argument('--out', default=None, help="write the results to this CSV")
+    args = parser.parse_args()
+
+    server = MockEntsoeServer(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                              requests_per_minute=args.server_rpm, fixtures_dir=args.fixtures).start()
+    print(f"Mock ENTSO-E API running at {server.url}")
+    if args.serve:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        start = pd.Timestamp(args.start, tz='Europe/Amsterdam')
+        end = pd.Timestamp(args.end, tz='Europe/Amsterdam')
+        results = run_benchmark(server, [(name, start, end) for name in args.workloads],
+                                workers=args.workers, chunk_days=args.chunk_days)
+        server.stop()
+        print(results.to_string(index=False))
+        if args.out:
+            results.to_csv(args.out, index=False)
+            print(f"Saved benchmark results to {args.out}")
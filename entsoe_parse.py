@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fast parsers for raw ENTSO-E XML documents.
+
+parse_a44_arrays() streams a Publication_MarketDocument (A44 day-ahead prices)
+with iterparse and writes straight into preallocated NumPy arrays: int64 UTC
+epoch seconds and float64 prices, one pair per resolution (PT15M / PT60M).
+Curve type A03 (positions left out when the price repeats) is forward filled.
+No BeautifulSoup tree and no intermediate DataFrames are built, which keeps
+backfills cheaper in CPU time and peak memory than entsoe-py's parse_prices.
+
+parse_balancing_document() does the same for Balancing_MarketDocuments
+(A81 FCR/aFRR capacity prices, A84 activated balancing energy prices) and
+returns typed columns keyed by UTC timestamp, product and direction.
+@author: Mayk Thewessen
+"""
+
+import calendar
+import datetime
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+
+RESOLUTION_SECONDS = {
+    'PT1M': 60,
+    'PT15M': 900,
+    'PT30M': 1800,
+    'PT60M': 3600,
+    'PT4H': 14400,
+    'P1D': 86400,
+    'P7D': 604800,
+}
+
+# SDAC moved to 15-minute MTUs on this delivery day (same date entsoe-py uses)
+QUARTER_MTU_SDAC_GOLIVE = pd.Timestamp('2025-10-01', tz='Europe/Amsterdam')
+
+
+def to_epoch(text):
+    """'2024-01-01T23:00Z' -> epoch seconds (UTC)."""
+    fmt = '%Y-%m-%dT%H:%MZ' if len(text) == 17 else '%Y-%m-%dT%H:%M:%SZ'
+    return calendar.timegm(datetime.datetime.strptime(text, fmt).timetuple())
+
+
+class _SeriesBuffer:
+    """Growable pair of epoch / value arrays for one resolution."""
+
+    def __init__(self, capacity):
+        self.epoch = np.empty(max(capacity, 1), dtype=np.int64)
+        self.value = np.empty(max(capacity, 1), dtype=np.float64)
+        self.used = 0
+
+    def reserve(self, start, step, n):
+        # Claim n consecutive slots on the grid start + i * step, prices NaN until filled
+        if self.used + n > len(self.epoch):
+            new_capacity = max(2 * len(self.epoch), self.used + n)
+            self.epoch = np.resize(self.epoch, new_capacity)
+            self.value = np.resize(self.value, new_capacity)
+        offset = self.used
+        self.epoch[offset:offset + n] = start + step * np.arange(n, dtype=np.int64)
+        self.value[offset:offset + n] = np.nan
+        self.used += n
+        return offset
+
+    def arrays(self):
+        epoch, value = self.epoch[:self.used], self.value[:self.used]
+        if len(epoch) > 1 and not np.all(epoch[1:] > epoch[:-1]):
+            # Overlapping or unsorted periods: sort and keep the last value per timestamp
+            order = np.argsort(epoch, kind='stable')
+            epoch, value = epoch[order], value[order]
+            keep = np.append(epoch[1:] != epoch[:-1], True)
+            epoch, value = epoch[keep], value[keep]
+        return epoch, value
+
+
+def _ffill(values):
+    # Vectorised forward fill of NaNs (A03 curves leave out repeated positions)
+    mask = np.isnan(values)
+    if not mask.any():
+        return values
+    idx = np.where(~mask, np.arange(len(values)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    # leading NaNs point at position 0, which is NaN itself, so they stay NaN
+    return values[idx]
+
+
+def parse_a44_arrays(xml, value_tag='price.amount'):
+    """Parse an A44 document into {resolution_seconds: (epoch_s int64, price float64)}.
+
+    xml may be str or bytes. Points are placed by period start + (position - 1)
+    * resolution; missing positions of A03 curves are forward filled, missing
+    positions of A01 curves stay NaN. The result is sorted by time.
+    """
+    if isinstance(xml, str):
+        xml = xml.encode('utf-8')
+    buffers = {}
+    doc_start = doc_end = None
+    start = end = None
+    curve_type = 'A01'
+    period = None  # (buffer, offset, n) of the Period being parsed
+    resolution = None
+    position = None
+
+    for _, elem in ET.iterparse(io.BytesIO(xml), events=('end',)):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if tag == 'position':
+            position = int(elem.text)
+        elif tag == value_tag:
+            if period is None:
+                # First point of a Period: start, end and resolution are known, reserve its slots
+                step = RESOLUTION_SECONDS[resolution]
+                n = (end - start) // step
+                if step not in buffers:
+                    capacity = (doc_end - doc_start) // step if doc_start is not None else n
+                    buffers[step] = _SeriesBuffer(max(capacity, n))
+                buffer = buffers[step]
+                period = (buffer, buffer.reserve(start, step, n), n)
+            buffer, offset, n = period
+            if 1 <= position <= n:
+                buffer.value[offset + position - 1] = float(elem.text.replace(',', ''))
+        elif tag == 'Point':
+            elem.clear()
+        elif tag == 'start':
+            start = to_epoch(elem.text)
+        elif tag == 'end':
+            end = to_epoch(elem.text)
+        elif tag == 'period.timeInterval':
+            doc_start, doc_end = start, end
+        elif tag == 'resolution':
+            resolution = elem.text
+        elif tag == 'curveType':
+            curve_type = elem.text
+        elif tag == 'Period':
+            if period is not None and curve_type == 'A03':
+                buffer, offset, n = period
+                buffer.value[offset:offset + n] = _ffill(buffer.value[offset:offset + n])
+            period = None
+        elif tag == 'TimeSeries':
+            curve_type = 'A01'
+            elem.clear()
+
+    return {step: buffer.arrays() for step, buffer in buffers.items()}
+
+
+def select_sdac_prices(arrays):
+    """Merge the resolutions of parse_a44_arrays into one SDAC price curve.
+
+    Like entsoe-py: hourly before the 15-minute MTU go-live, quarter-hourly
+    from then on. Before go-live PT60M points are used (PT15M points on full
+    hours as fallback); from go-live PT15M points are used (PT60M as fallback).
+    Returns (epoch_s, price).
+    """
+    golive = int(QUARTER_MTU_SDAC_GOLIVE.timestamp())
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+    hourly, quarter = arrays.get(3600, empty), arrays.get(900, empty)
+
+    on_hour = quarter[0] % 3600 == 0
+    parts = []
+    for epoch, price in (hourly, (quarter[0][on_hour], quarter[1][on_hour])):
+        parts.append((epoch[epoch < golive], price[epoch < golive]))
+    for epoch, price in (quarter, hourly):
+        parts.append((epoch[epoch >= golive], price[epoch >= golive]))
+
+    epoch = np.concatenate([p[0] for p in parts])
+    price = np.concatenate([p[1] for p in parts])
+    # Keep the first (preferred) value per timestamp
+    order = np.argsort(epoch, kind='stable')
+    epoch, price = epoch[order], price[order]
+    keep = np.append(True, epoch[1:] != epoch[:-1])
+    return epoch[keep], price[keep]
+
+
+def arrays_to_series(epoch, price, tz='Europe/Brussels'):
+    """Wrap epoch/price arrays in a tz-aware pd.Series without copying the prices."""
+    index = pd.DatetimeIndex(epoch.astype('datetime64[s]')).tz_localize('UTC').tz_convert(tz)
+    return pd.Series(price, index=index)
+
+
+def query_day_ahead_prices_fast(client, country_code, start, end):
+    """Drop-in for client.query_day_ahead_prices that parses the raw A44 XML with parse_a44_arrays.
+
+    client can be an EntsoePandasClient or EntsoeRawClient. Returns a
+    pd.Series in the zone's time zone, truncated to [start, end] like entsoe-py.
+    """
+    from entsoe import EntsoeRawClient
+    from entsoe.exceptions import NoMatchingDataError
+    from entsoe.mappings import lookup_area
+
+    area = lookup_area(country_code)
+    epochs, prices = [], []
+    offset = 0
+    while True:
+        try:
+            text = EntsoeRawClient.query_day_ahead_prices(
+                client, area, start=start - pd.Timedelta(days=1), end=end + pd.Timedelta(days=1),
+                offset=offset, sequence=1 if area.name in ['DE_LU', 'AT'] else None)
+        except NoMatchingDataError:
+            break
+        epoch, price = select_sdac_prices(parse_a44_arrays(text))
+        epochs.append(epoch)
+        prices.append(price)
+        # ENTSO-E returns at most 100 daily documents per request
+        if text.count('<TimeSeries>') < 100:
+            break
+        offset += 100
+    if not epochs:
+        raise NoMatchingDataError
+    epoch, price = np.concatenate(epochs), np.concatenate(prices)
+    if len(epochs) > 1:
+        order = np.argsort(epoch, kind='stable')
+        epoch, price = epoch[order], price[order]
+        keep = np.append(True, epoch[1:] != epoch[:-1])
+        epoch, price = epoch[keep], price[keep]
+    keep = (epoch >= int(start.timestamp())) & (epoch <= int(end.timestamp()))
+    if not keep.any():
+        raise NoMatchingDataError
+    return arrays_to_series(epoch[keep], price[keep], area.tz)
+
+
+#%% Balancing documents (FCR / aFRR capacity and energy prices)
+
+# process.processType (capacity documents) and businessType (energy documents) -> product
+PROCESS_PRODUCTS = {'A52': 'FCR', 'A51': 'aFRR', 'A47': 'mFRR', 'A46': 'RR'}
+BUSINESS_PRODUCTS = {'A95': 'FCR', 'A96': 'aFRR', 'A97': 'mFRR', 'A98': 'RR'}
+DIRECTIONS = {'A01': 'up', 'A02': 'down', 'A03': 'symmetric'}
+BALANCING_PRICE_TAGS = ('procurement_Price.amount', 'activation_Price.amount')
+
+
+def iter_xml_documents(content):
+    """Yield the XML documents of a response: ENTSO-E answers some queries with a ZIP of XML files."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if content[:2] == b'PK':
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            for info in archive.infolist():
+                if info.filename.endswith('xml'):
+                    yield archive.read(info)
+    else:
+        yield content
+
+
+def parse_balancing_document(content):
+    """Parse A81/A84 balancing documents (XML or ZIP of XML) into a dict of typed columns.
+
+    Columns: timestamp (int64 UTC epoch s), resolution_s (int32), product,
+    direction, market_agreement (str arrays), price and quantity (float64).
+    One row per Point; A03 curves are forward filled per Period.
+    """
+    columns = {name: [] for name in ('timestamp', 'resolution_s', 'price', 'quantity')}
+    labels = {name: [] for name in ('product', 'direction', 'market_agreement')}
+
+    for xml in iter_xml_documents(content):
+        process_type = None
+        start = end = None
+        resolution = None
+        position = None
+        series = {}
+        period = None  # dict with the arrays of the Period being parsed
+        series_periods = []
+
+        for _, elem in ET.iterparse(io.BytesIO(xml), events=('end',)):
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if tag == 'position':
+                position = int(elem.text)
+            elif tag in BALANCING_PRICE_TAGS or tag == 'quantity':
+                if period is None:
+                    step = RESOLUTION_SECONDS[resolution]
+                    n = max((end - start) // step, 1)
+                    period = {'timestamp': start + step * np.arange(n, dtype=np.int64),
+                              'resolution_s': np.full(n, step, dtype=np.int32),
+                              'price': np.full(n, np.nan), 'quantity': np.full(n, np.nan)}
+                if 1 <= position <= len(period['price']):
+                    column = 'quantity' if tag == 'quantity' else 'price'
+                    period[column][position - 1] = float(elem.text.replace(',', ''))
+            elif tag == 'Point':
+                elem.clear()
+            elif tag == 'start':
+                start = to_epoch(elem.text)
+            elif tag == 'end':
+                end = to_epoch(elem.text)
+            elif tag == 'resolution':
+                resolution = elem.text
+            elif tag == 'process.processType':
+                process_type = elem.text
+            elif tag in ('businessType', 'flowDirection.direction', 'type_MarketAgreement.type', 'curveType'):
+                series[tag] = elem.text
+            elif tag == 'Period':
+                if period is not None:
+                    series_periods.append(period)
+                period = None
+            elif tag == 'TimeSeries':
+                # All series attributes are known now, label its periods
+                product = PROCESS_PRODUCTS.get(process_type) or BUSINESS_PRODUCTS.get(series.get('businessType'), '')
+                direction = DIRECTIONS.get(series.get('flowDirection.direction'), '')
+                agreement = series.get('type_MarketAgreement.type', '')
+                for p in series_periods:
+                    if series.get('curveType') == 'A03':
+                        p['price'], p['quantity'] = _ffill(p['price']), _ffill(p['quantity'])
+                    for name in columns:
+                        columns[name].append(p[name])
+                    n = len(p['timestamp'])
+                    labels['product'].append(np.full(n, product, dtype=object))
+                    labels['direction'].append(np.full(n, direction, dtype=object))
+                    labels['market_agreement'].append(np.full(n, agreement, dtype=object))
+                series = {}
+                series_periods = []
+                elem.clear()
+
+    dtypes = {'timestamp': np.int64, 'resolution_s': np.int32, 'price': np.float64, 'quantity': np.float64}
+    result = {name: np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[name])
+              for name, parts in columns.items()}
+    result.update({name: np.concatenate(parts) if parts else np.empty(0, dtype=object)
+                   for name, parts in labels.items()})
+    return result
+
+
+def balancing_to_frame(columns):
+    """DataFrame with a UTC DatetimeIndex and categorical product/direction columns."""
+    df = pd.DataFrame({
+        'product': pd.Categorical(columns['product']),
+        'direction': pd.Categorical(columns['direction']),
+        'market_agreement': pd.Categorical(columns['market_agreement']),
+        'resolution_s': columns['resolution_s'],
+        'price': columns['price'],
+        'quantity': columns['quantity'],
+    }, index=pd.DatetimeIndex(columns['timestamp'].astype('datetime64[s]'), name='timestamp').tz_localize('UTC'))
+    return df
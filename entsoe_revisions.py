@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pick up re-published (corrected) ENTSO-E prices without refetching whole years.
+
+verify_days() re-queries a recent window straight from the API (the response
+cache is bypassed and refreshed), computes a small digest per delivery day of
+the new and of the stored rows, and writes only the days whose digest differs
+into the store (ingest log + compaction, so only the affected months are
+rewritten). Every change is appended to the revision history
+data/store/{dataset}/zone={zone}/_revisions.jsonl with the old and new digest,
+the number of changed values and the largest change.
+
+Usage:
+    python entsoe_revisions.py --dataset imbalance --zones NL --days 30
+    python entsoe_revisions.py --dataset DA --start 2024-01-01 --end 2025-01-01 --dry-run
+    python entsoe_revisions.py --history --dataset imbalance
+@author: Mayk Thewessen
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from entsoe_fetch import get_da_prices_chunked, get_imbalance_prices_chunked
+from entsoe_store import STORE_DIR, append_log, compact, read_store, to_columns, to_index
+
+
+DEFAULT_TZ = 'Europe/Amsterdam'
+REVISIONS_NAME = '_revisions.jsonl'
+# Days re-checked by default: imbalance prices get corrected for weeks after delivery, DA hardly ever
+RECHECK_DAYS = {'imbalance': 30, 'DA': 7}
+
+
+def revisions_path(dataset, zone, store_dir=STORE_DIR):
+    return os.path.join(store_dir, dataset, f'zone={zone}', REVISIONS_NAME)
+
+
+def fetch_fresh(client, dataset, zone, start, end, **fetch_kwargs):
+    """Query dataset from the API as a DataFrame with the store's columns."""
+    if dataset == 'DA':
+        prices = get_da_prices_chunked(client, zone, start, end, fast_parse=True, **fetch_kwargs)
+        return prices.to_frame('DA_price') if isinstance(prices, pd.Series) else prices
+    if dataset == 'imbalance':
+        imb = get_imbalance_prices_chunked(client, zone, start, end, **fetch_kwargs)
+        return imb[['Long', 'Short']] if len(imb) else imb
+    raise ValueError(f"No fetch function for dataset {dataset}")
+
+
+def _sorted_columns(columns):
+    # Sorted by timestamp, last row of a duplicated timestamp wins (as in the store)
+    timestamps = columns['timestamp']
+    order = np.argsort(timestamps, kind='stable')
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = timestamps[order][1:] != timestamps[order][:-1]
+    return {name: values[order[keep]] for name, values in columns.items()}
+
+
+def day_digests(columns, names, tz=DEFAULT_TZ):
+    """{day (local midnight, UTC epoch s): (digest, row slice)} over the timestamp and the `names` columns."""
+    timestamps = columns['timestamp']
+    if len(timestamps) == 0:
+        return {}
+    days = to_index(timestamps, tz).normalize().as_unit('s').asi8
+    bounds = np.flatnonzero(np.diff(days)) + 1
+    digests = {}
+    for first, last in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(days)].tolist()):
+        digest = hashlib.blake2b(timestamps[first:last].tobytes(), digest_size=8)
+        for name in names:
+            digest.update(np.ascontiguousarray(columns[name][first:last]).tobytes())
+        digests[int(days[first])] = (digest.hexdigest(), slice(first, last))
+    return digests
+
+
+def compare_days(stored, fresh, tz=DEFAULT_TZ):
+    """Days whose fresh rows differ from the stored rows; days the source no longer returns are left alone.
+
+    stored and fresh are dicts of numpy columns in store types. Returns a list
+    of revision records (dicts), one per changed or new day.
+    """
+    names = [name for name in fresh if name != 'timestamp']
+    stored_days = day_digests(stored, [n for n in names if n in stored], tz) if stored else {}
+    fresh_days = day_digests(fresh, names, tz)
+    revisions = []
+    for day, (digest, rows) in fresh_days.items():
+        old_digest, old_rows = stored_days.get(day, (None, None))
+        if digest == old_digest:
+            continue
+        record = {'day': to_index([day], tz)[0].strftime('%Y-%m-%d'), 'old_digest': old_digest,
+                  'new_digest': digest, 'rows': rows.stop - rows.start, 'changed_values': 0, 'max_abs_change': None}
+        if old_rows is not None:
+            old_ts, new_ts = stored['timestamp'][old_rows], fresh['timestamp'][rows]
+            _, old_i, new_i = np.intersect1d(old_ts, new_ts, assume_unique=True, return_indices=True)
+            changed, largest = len(old_ts) + len(new_ts) - 2 * len(old_i), 0.0
+            for name in names:
+                if name not in stored:
+                    continue
+                old_values = stored[name][old_rows][old_i].astype(np.float64)
+                new_values = fresh[name][rows][new_i].astype(np.float64)
+                differs = ~((old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values)))
+                changed += int(differs.sum())
+                delta = np.abs(new_values - old_values)[differs]
+                if len(delta) and np.isfinite(delta).any():
+                    largest = max(largest, float(np.nanmax(delta)))
+            record['changed_values'] = changed
+            record['max_abs_change'] = round(largest, 3)
+        record['rows_slice'] = rows
+        revisions.append(record)
+    return revisions
+
+
+def append_revisions(records, dataset, zone, store_dir=STORE_DIR):
+    file_path = revisions_path(dataset, zone, store_dir)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def load_revisions(dataset, zone, store_dir=STORE_DIR):
+    """Revision history of dataset/zone as a DataFrame (empty when nothing was ever revised)."""
+    file_path = revisions_path(dataset, zone, store_dir)
+    if not os.path.exists(file_path):
+        return pd.DataFrame()
+    with open(file_path, 'r') as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def verify_days(client, dataset, zone, start, end, store_dir=STORE_DIR, tz=DEFAULT_TZ, apply=True, **fetch_kwargs):
+    """Re-query [start, end), compare day by day with the store and rewrite only the changed days.
+
+    With apply=False the changes are only reported. Returns the revision
+    records as a DataFrame (one row per changed or newly available day).
+    """
+    fresh = fetch_fresh(client, dataset, zone, start, end, **fetch_kwargs)
+    if len(fresh) == 0:
+        print(f"No {dataset} data returned for {zone} {start} to {end}")
+        return pd.DataFrame()
+    fresh_columns = _sorted_columns(to_columns(fresh))
+    # entsoe-py may return the row at `end` as well; compare exactly the window that is read from the store
+    inside = (fresh_columns['timestamp'] >= int(start.timestamp())) & (fresh_columns['timestamp'] < int(end.timestamp()))
+    fresh_columns = {name: values[inside] for name, values in fresh_columns.items()}
+    stored_columns = read_store(dataset, zone, start, end, tz=tz, store_dir=store_dir, as_arrays=True) \
+        if os.path.isdir(os.path.join(store_dir, dataset)) else {}
+    stored_columns.pop('zone', None)
+
+    revisions = compare_days(stored_columns, fresh_columns, tz)
+    detected_at = pd.Timestamp.now(tz='UTC').isoformat(timespec='seconds')
+    for record in revisions:
+        record.update({'dataset': dataset, 'zone': zone, 'detected_at': detected_at, 'applied': apply})
+    slices = [record.pop('rows_slice') for record in revisions]
+    print(f"{dataset} {zone}: {len(revisions)} days changed or new between {start} and {end}")
+    if not revisions:
+        return pd.DataFrame()
+
+    if apply:
+        mask = np.zeros(len(fresh_columns['timestamp']), dtype=bool)
+        for rows in slices:
+            mask[rows] = True
+        names = [name for name in fresh_columns if name != 'timestamp']
+        changed = pd.DataFrame({name: fresh_columns[name][mask] for name in names},
+                               index=to_index(fresh_columns['timestamp'][mask], tz))
+        append_log(changed, dataset, zone, store_dir)
+        compact(dataset, zone, store_dir)
+        append_revisions(revisions, dataset, zone, store_dir)
+    return pd.DataFrame(revisions)
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from entsoe import EntsoePandasClient
+    from entsoe_clients import make_session
+
+    parser = argparse.ArgumentParser(description="Re-check stored prices against ENTSO-E and rewrite only the days that changed")
+    parser.add_argument('--dataset', default='imbalance', choices=sorted(RECHECK_DAYS))
+    parser.add_argument('--zones', nargs='+', default=['NL'])
+    parser.add_argument('--days', type=int, default=None, help="re-check the last N days (default per dataset)")
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--dry-run', action='store_true', help="report changed days without writing them")
+    parser.add_argument('--history', action='store_true', help="print the revision history and exit")
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+
+    if args.history:
+        for zone in args.zones:
+            print(load_revisions(args.dataset, zone, args.store_dir).to_string(index=False))
+        raise SystemExit(0)
+
+    today = pd.Timestamp.now(tz=DEFAULT_TZ).normalize()
+    end = pd.Timestamp(args.end, tz=DEFAULT_TZ) if args.end else today
+    start = pd.Timestamp(args.start, tz=DEFAULT_TZ) if args.start \
+        else end - pd.Timedelta(days=args.days or RECHECK_DAYS[args.dataset])
+
+    load_dotenv()
+    # Straight to the API with a refreshing cache session: cached documents (and the broker's) may be the outdated ones
+    client = EntsoePandasClient(api_key=os.getenv('ENTSOE_API_KEY', 'default_api_key'), session=make_session(refresh=True))
+    for zone in args.zones:
+        revisions = verify_days(client, args.dataset, zone, start, end, args.store_dir, apply=not args.dry_run,
+                                failed_ledger_path=None)
+        if len(revisions):
+            print(revisions[['day', 'rows', 'changed_values', 'max_abs_change']].to_string(index=False))
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact on-disk format for price series: implicit time grid, fixed-point deltas, zstd.
+
+In the CSVs the timestamp string takes most of every row. Here the time axis
+is stored as a few segments (origin + step + length; a new segment starts
+at a gap or at a change of resolution, e.g. the 15-min DA go-live). Prices
+are stored as integers in EUR 0.01/MWh, delta encoded in the narrowest integer
+type that fits (int16 for DA, int32 for spiky imbalance), and compressed with zstd via
+pyarrow. NaNs are kept in a separate bit mask. Decoding gives back exactly the
+same float values, which encode_series() checks before it writes anything.
+
+File: 8-byte magic ENTSOSER, uint32 header length, JSON header (segments,
+scale, codec, columns), then per column the compressed delta block and the
+optional NaN mask.
+
+Usage:
+    from entsoe_series import write_series, read_series
+    write_series('data/series/imbalance_NL_2024.eps', imb[['Long', 'Short']])
+    imb = read_series('data/series/imbalance_NL_2024.eps')
+
+    python entsoe_series.py --from-store --zones NL     # data/store -> data/series, one file per dataset/zone/year
+@author: Mayk Thewessen
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from entsoe_align import time_segments, to_epoch_seconds
+
+
+SERIES_DIR = os.path.join('data', 'series')
+MAGIC = b'ENTSOSER'
+VERSION = 1
+DEFAULT_SCALE = 100       # fixed-point unit: EUR 0.01/MWh, the precision ENTSO-E publishes
+DEFAULT_CODEC = 'zstd'
+DEFAULT_TZ = 'Europe/Amsterdam'
+
+
+#%% Encoding
+
+def segment_timestamps(segments):
+    if not segments:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([origin + step * np.arange(length, dtype=np.int64) for origin, step, length in segments])
+
+
+def _narrowest(deltas):
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if len(deltas) == 0 or (deltas.min() >= info.min and deltas.max() <= info.max):
+            return dtype
+    return np.int64
+
+
+def _encode_column(values, scale, codec):
+    values = np.asarray(values)
+    nan = np.isnan(values)
+    fixed = np.round(values.astype(np.float64) * scale)
+    decoded = (fixed / scale).astype(values.dtype)
+    if not np.array_equal(decoded[~nan], values[~nan]):
+        worst = values[~nan][decoded[~nan] != values[~nan]][0]
+        raise ValueError(f"{worst!r} is not exactly representable in steps of 1/{scale}; pass a larger scale")
+    fixed = np.where(nan, 0, fixed).astype(np.int64)
+    if nan.any():
+        # NaN slots repeat the previous value, so they add zero deltas
+        previous = np.where(nan, 0, np.arange(len(fixed)))
+        fixed = fixed[np.maximum.accumulate(previous)]
+    deltas = np.diff(fixed, prepend=0)
+    dtype = _narrowest(deltas)
+    raw = deltas.astype(dtype).tobytes()
+    blocks = [pa.compress(raw, codec=codec, asbytes=True)]
+    meta = {'dtype': np.dtype(dtype).name, 'value_dtype': values.dtype.name, 'raw_size': len(raw),
+            'size': len(blocks[0]), 'mask_size': 0}
+    if nan.any():
+        mask = np.packbits(nan).tobytes()
+        blocks.append(pa.compress(mask, codec=codec, asbytes=True))
+        meta.update(mask_raw_size=len(mask), mask_size=len(blocks[1]))
+    return meta, b''.join(blocks)
+
+
+def encode_series(timestamps, columns, scale=DEFAULT_SCALE, codec=DEFAULT_CODEC):
+    """Encode sorted, unique UTC epoch seconds and {name: float array} into the compact format (bytes)."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) > 1 and not (np.diff(timestamps) > 0).all():
+        raise ValueError("timestamps must be sorted and unique")
+    header = {'version': VERSION, 'scale': scale, 'codec': codec, 'rows': int(len(timestamps)),
+              'segments': time_segments(timestamps), 'columns': []}
+    blobs = []
+    for name, values in columns.items():
+        if len(values) != len(timestamps):
+            raise ValueError(f"column {name} has {len(values)} values for {len(timestamps)} timestamps")
+        meta, blob = _encode_column(values, scale, codec)
+        header['columns'].append(dict(meta, name=str(name)))
+        blobs.append(blob)
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    return MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + b''.join(blobs)
+
+
+#%% Decoding
+
+def read_header(data):
+    if data[:8] != MAGIC:
+        raise ValueError("not a compact price series (wrong magic)")
+    (header_size,) = struct.unpack_from('<I', data, 8)
+    header = json.loads(bytes(data[12:12 + header_size]))
+    if header['version'] != VERSION:
+        raise ValueError(f"series format version {header['version']}, expected {VERSION}")
+    return header, 12 + header_size
+
+
+def decode_series(data, columns=None, dtype=None):
+    """Decode bytes from encode_series into (int64 UTC epoch seconds, {name: values}).
+
+    Only the requested columns are decompressed. Values come back in the
+    dtype they were written with unless dtype is given.
+    """
+    header, offset = read_header(data)
+    codec, scale = header['codec'], header['scale']
+    decoded = {}
+    for meta in header['columns']:
+        size = meta['size'] + meta['mask_size']
+        if columns is None or meta['name'] in columns:
+            raw = pa.decompress(data[offset:offset + meta['size']], meta['raw_size'], codec=codec, asbytes=True)
+            fixed = np.cumsum(np.frombuffer(raw, dtype=meta['dtype']), dtype=np.int64)
+            values = (fixed / scale).astype(dtype or meta['value_dtype'])
+            if meta['mask_size']:
+                mask = pa.decompress(data[offset + meta['size']:offset + size], meta['mask_raw_size'],
+                                     codec=codec, asbytes=True)
+                values[np.unpackbits(np.frombuffer(mask, dtype=np.uint8), count=len(values)).astype(bool)] = np.nan
+            decoded[meta['name']] = values
+        offset += size
+    return segment_timestamps(header['segments']), decoded
+
+
+#%% Files
+
+def write_series(file_path, data, scale=DEFAULT_SCALE, codec=DEFAULT_CODEC):
+    """Write a Series / DataFrame with a DatetimeIndex to file_path; returns the file size in bytes."""
+
+    if isinstance(data, pd.Series):
+        data = data.to_frame(data.name if data.name is not None else 'price')
+    data = data[~data.index.duplicated(keep='last')].sort_index()
+    encoded = encode_series(to_epoch_seconds(data.index),
+                            {name: data[name].to_numpy(dtype=np.float32 if data[name].dtype == np.float32 else np.float64,
+                                                       na_value=np.nan) for name in data.columns},
+                            scale, codec)
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(file_path + '.tmp', 'wb') as f:
+        f.write(encoded)
+    os.replace(file_path + '.tmp', file_path)
+    return len(encoded)
+
+
+def read_series(file_path, columns=None, tz=DEFAULT_TZ, dtype=None):
+    """Read a compact series file into a DataFrame indexed by time in tz."""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    timestamps, values = decode_series(data, columns, dtype)
+    index = pd.DatetimeIndex(pd.to_datetime(timestamps, unit='s', utc=True)).tz_convert(tz).rename('time')
+    return pd.DataFrame(values, index=index)
+
+
+def series_path(dataset, zone, year, series_dir=SERIES_DIR):
+    return os.path.join(series_dir, f'{dataset}_{zone}_{year}.eps')
+
+
+def export_store(dataset, zone, series_dir=SERIES_DIR, tz=DEFAULT_TZ, **store_kwargs):
+    """Write every (local) year of dataset/zone from the Parquet store into one compact file; returns the paths."""
+    from entsoe_store import read_store
+
+    df = read_store(dataset, zone, tz=tz, **store_kwargs)
+    paths = []
+    for year, part in df.groupby(df.index.year):
+        # float32 as in the store; read_series(..., dtype=np.float64) gives the exact decimal prices
+        path = series_path(dataset, zone, year, series_dir)
+        size = write_series(path, part)
+        print(f"Wrote {path}: {len(part)} rows, {size / 1024:.1f} kB")
+        paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compact price series files (fixed-point deltas + zstd)")
+    parser.add_argument('--from-store', action='store_true', help="export data/store to data/series")
+    parser.add_argument('--datasets', nargs='+', default=['DA', 'imbalance'])
+    parser.add_argument('--zones', nargs='+', default=['NL'])
+    parser.add_argument('--series-dir', default=SERIES_DIR)
+    args = parser.parse_args()
+
+    if args.from_store:
+        for dataset in args.datasets:
+            for zone in args.zones:
+                export_store(dataset, zone, args.series_dir)
+    files = sorted(glob.glob(os.path.join(args.series_dir, '*.eps')))
+    t0 = time.perf_counter()
+    rows = sum(len(read_series(path)) for path in files)
+    elapsed = time.perf_counter() - t0
+    total = sum(os.path.getsize(path) for path in files)
+    print(f"{len(files)} files, {total / 1024:.1f} kB, {rows} rows read back in {elapsed * 1000:.0f} ms")
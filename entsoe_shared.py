@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Share loaded price data between processes as memory-mapped Arrow IPC files.
+
+publish() writes a table once as an uncompressed Arrow IPC file into shared
+memory (/dev/shm/entsoe on Linux, data/shared elsewhere). attach() maps that
+file: the returned pyarrow Table and the numpy arrays from attach_arrays()
+point straight into the mapping, so every worker, dashboard or notebook that
+attaches shares the same physical pages through the OS page cache instead of
+holding its own copy (or unpickling one sent by a parent process).
+
+Usage:
+    python entsoe_shared.py --publish DA imbalance --zones NL BE DE_LU
+    python entsoe_shared.py --list
+
+    from entsoe_shared import attach_arrays, attach_frame, map_over_processes
+    arrays = attach_arrays('imbalance')        # zero-copy numpy views
+    df = attach_frame('DA')                    # pandas (index built locally)
+    results = map_over_processes(zone_stats, 'imbalance', ['NL', 'BE'])
+@author: Mayk Thewessen
+"""
+
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+
+from entsoe_store import STORE_DIR, read_store, to_index
+
+
+DEFAULT_TZ = 'Europe/Amsterdam'
+SHARED_DIR = '/dev/shm/entsoe' if os.path.isdir('/dev/shm') else os.path.join('data', 'shared')
+
+
+def shared_path(name, shared_dir=SHARED_DIR):
+    return os.path.join(shared_dir, f'{name}.arrow')
+
+
+def publish(name, data, shared_dir=SHARED_DIR, metadata=None):
+    """Write data (pyarrow Table or dict of numpy arrays) as name; returns the file path.
+
+    The file is replaced atomically, so processes still attached to the old
+    version keep reading it until they attach again.
+    """
+    table = data if isinstance(data, pa.Table) else pa.table(
+        {key: pa.array(values).dictionary_encode() if values.dtype == object else values for key, values in data.items()})
+    if metadata:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               **{str(k): str(v) for k, v in metadata.items()}})
+    file_path = shared_path(name, shared_dir)
+    os.makedirs(shared_dir, exist_ok=True)
+    # No compression: compressed buffers would have to be decoded (copied) by every reader
+    with pa.OSFile(file_path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(file_path + '.tmp', file_path)
+    return file_path
+
+
+def attach(name, shared_dir=SHARED_DIR):
+    """Memory-map a published table; its buffers are views into the shared file (no copy)."""
+    file_path = shared_path(name, shared_dir)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"{name} is not published in {shared_dir}; run entsoe_shared.py --publish {name}")
+    with pa.memory_map(file_path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def attach_arrays(name, shared_dir=SHARED_DIR):
+    """Published table as a dict of read-only numpy views (dictionary columns such as zone are decoded)."""
+    table = attach(name, shared_dir)
+    arrays = {}
+    for column_name in table.column_names:
+        column = table.column(column_name)
+        # combine_chunks() copies even a single chunk; publish() writes one chunk per column
+        column = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if pa.types.is_dictionary(column.type):
+            arrays[column_name] = column.dictionary.to_numpy(zero_copy_only=False)[column.indices.to_numpy()]
+        else:
+            arrays[column_name] = column.to_numpy(zero_copy_only=True)
+    return arrays
+
+
+def attach_frame(name, tz=None, shared_dir=SHARED_DIR):
+    """Published table as a DataFrame indexed by time (price columns stay views into the shared file)."""
+    table = attach(name, shared_dir)
+    metadata = table.schema.metadata or {}
+    tz = tz or metadata.get(b'tz', DEFAULT_TZ.encode()).decode()
+    df = table.drop_columns(['timestamp']).to_pandas(split_blocks=True, self_destruct=False)
+    df.index = to_index(table.column('timestamp').to_numpy(), tz)
+    return df
+
+
+def list_published(shared_dir=SHARED_DIR):
+    """{name: (rows, MB)} of the published tables."""
+    published = {}
+    for file_path in sorted(glob.glob(os.path.join(shared_dir, '*.arrow'))):
+        with pa.memory_map(file_path, 'r') as source:
+            rows = pa.ipc.open_file(source).read_all().num_rows
+        published[os.path.basename(file_path)[:-len('.arrow')]] = (rows, os.path.getsize(file_path) / 1024 ** 2)
+    return published
+
+
+def unpublish(name, shared_dir=SHARED_DIR):
+    file_path = shared_path(name, shared_dir)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+def publish_store(dataset, zones=None, start=None, end=None, name=None, shared_dir=SHARED_DIR,
+                  store_dir=STORE_DIR, tz=DEFAULT_TZ):
+    """Load dataset for all (or the given) zones from the Parquet store once and publish it (default name: dataset)."""
+    arrays = read_store(dataset, zones, start, end, tz=tz, store_dir=store_dir, as_arrays=True)
+    if not arrays:
+        print(f"No {dataset} data in {store_dir}")
+        return None
+    file_path = publish(name or dataset, arrays, shared_dir, metadata={'dataset': dataset, 'tz': tz})
+    print(f"Published {dataset}: {len(arrays['timestamp'])} rows, {os.path.getsize(file_path) / 1024 ** 2:.1f} MB in {file_path}")
+    return file_path
+
+
+#%% Worker processes
+
+_worker_table = None
+
+
+def _attach_in_worker(name, shared_dir):
+    global _worker_table
+    _worker_table = attach(name, shared_dir)
+
+
+def _call_in_worker(func, item):
+    return func(_worker_table, item)
+
+
+def map_over_processes(func, name, items, max_workers=None, shared_dir=SHARED_DIR):
+    """Run func(table, item) for every item in worker processes that each attach the published table once.
+
+    Only func, the item and the result cross the process boundary; the data
+    itself is mapped, never pickled. func must be a module-level function.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach_in_worker,
+                             initargs=(name, shared_dir)) as pool:
+        return list(pool.map(_call_in_worker, [func] * len(items), items))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Publish price tables from the store into shared memory")
+    parser.add_argument('--publish', nargs='*', default=[], metavar='DATASET', help="datasets to publish, e.g. DA imbalance")
+    parser.add_argument('--zones', nargs='+', default=None, help="default: all zones in the store")
+    parser.add_argument('--drop', nargs='*', default=[], metavar='NAME', help="remove published tables")
+    parser.add_argument('--list', action='store_true')
+    parser.add_argument('--shared-dir', default=SHARED_DIR)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+
+    for dataset in args.publish:
+        publish_store(dataset, args.zones, shared_dir=args.shared_dir, store_dir=args.store_dir)
+    for name in args.drop:
+        unpublish(name, args.shared_dir)
+    if args.list or not (args.publish or args.drop):
+        for name, (rows, size) in list_published(args.shared_dir).items():
+            print(f"{name}: {rows} rows, {size:.1f} MB")
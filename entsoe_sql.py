@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQL over the price archive with an embedded DuckDB database.
+
+connect() opens an in-memory DuckDB connection with one view per dataset:
+  da, imbalance, ...     the Parquet store (entsoe_store), columns
+                         timestamp (UTC epoch s), time (TIMESTAMPTZ), the price
+                         columns, hours (stored: the time each row covers, 1
+                         hourly, 0.25 15-min), zone, year, month (UTC partition keys)
+  fcr_capacity, afrr_capacity, afrr_energy
+                         the balancing tables (entsoe_balancing), plus zone
+Filters on zone, year and month skip whole partitions. Filters on timestamp
+use the Parquet row-group statistics (to_epoch() converts a timestamp).
+Only the columns a query uses are read. The session time zone is
+Europe/Amsterdam, so hour(time) is the local delivery hour. Average prices
+as sum(DA_price * hours) / sum(hours): since the 15-min DA go-live a plain
+avg() counts a 15-min hour four times. The views read the partitions only:
+rows still in the store's ingest log show up after entsoe_store.compact()
+(python entsoe_store.py --compact). Stores written before the hours column
+existed need python entsoe_store.py --add-hours once.
+
+Usage:
+    python entsoe_sql.py "SELECT year, hour(time) AS hour, sum(DA_price * hours) / sum(hours) FROM da GROUP BY ALL ORDER BY ALL"
+    python entsoe_sql.py --csv out.csv "SELECT ..."
+    python entsoe_sql.py                        # interactive prompt
+
+    from entsoe_sql import query
+    df = query("SELECT * FROM imbalance WHERE zone = 'NL' AND timestamp >= to_epoch('2024-06-01')")
+@author: Mayk Thewessen
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import duckdb
+
+from entsoe_balancing import BALANCING_DIR, DATASETS as BALANCING_DATASETS
+from entsoe_store import STORE_DIR
+
+
+DEFAULT_TZ = 'Europe/Amsterdam'
+
+EXAMPLES = """Examples:
+  SELECT year(time) AS year, hour(time) AS hour, round(sum(DA_price * hours) / sum(hours), 1) AS price FROM da GROUP BY ALL ORDER BY ALL
+  SELECT month(time) AS month, hour(time) AS hour, round(sum(DA_price * hours) / sum(hours), 1) AS price FROM da WHERE year = 2024 GROUP BY ALL ORDER BY ALL
+  SELECT zone, avg(Short - Long) AS spread FROM imbalance WHERE timestamp >= to_epoch('2024-01-01') GROUP BY zone
+"""
+
+
+def _sql_path(path):
+    return path.replace("'", "''")
+
+
+def connect(store_dir=STORE_DIR, balancing_dir=BALANCING_DIR, tz=DEFAULT_TZ, database=':memory:'):
+    """DuckDB connection with views over all datasets found in store_dir and balancing_dir."""
+    con = duckdb.connect(database)
+    con.execute(f"SET TimeZone = '{tz}'")
+    # to_epoch('2024-06-01') = UTC epoch seconds of local midnight; compare with the timestamp column for pushdown
+    con.execute(f"CREATE MACRO to_epoch(t) AS epoch(timezone('{tz}', CAST(t AS TIMESTAMP)))::BIGINT")
+
+    if os.path.isdir(store_dir):
+        for dataset in sorted(os.listdir(store_dir)):
+            pattern = os.path.join(store_dir, dataset, 'zone=*', 'year=*', 'month=*', '*.parquet')
+            if not glob.glob(pattern):
+                continue
+            con.execute(f"""
+                CREATE VIEW "{dataset.lower()}" AS
+                SELECT to_timestamp(timestamp) AS time, *
+                FROM read_parquet('{_sql_path(pattern)}', hive_partitioning = true)""")
+
+    for dataset in BALANCING_DATASETS:
+        pattern = os.path.join(balancing_dir, f'{dataset}_*.parquet')
+        if not glob.glob(pattern):
+            continue
+        con.execute(f"""
+            CREATE VIEW "{dataset.lower()}" AS
+            SELECT * EXCLUDE (filename),
+                   regexp_extract(filename, '{dataset}_(.+)_[0-9]{{4}}\\.parquet$', 1) AS zone
+            FROM read_parquet('{_sql_path(pattern)}', filename = true)""")
+    return con
+
+
+def list_views(con):
+    return [row[0] for row in con.execute(
+        "SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name").fetchall()]
+
+
+def query(sql, params=None, con=None, as_arrow=False, **connect_kwargs):
+    """Run sql and return a pandas DataFrame (or a pyarrow Table with as_arrow=True)."""
+    con = con if con is not None else connect(**connect_kwargs)
+    result = con.execute(sql, params or [])
+    return result.fetch_arrow_table() if as_arrow else result.df()
+
+
+def run_and_print(con, sql, csv_path=None):
+    t0 = time.perf_counter()
+    df = query(sql, con=con)
+    elapsed = time.perf_counter() - t0
+    print(df.to_string(index=False, max_rows=60))
+    print(f"({len(df)} rows in {elapsed * 1000:.0f} ms)")
+    if csv_path:
+        df.to_csv(csv_path, index=False)
+        print(f"Saved result to {csv_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run SQL over the stored DA, imbalance and balancing prices",
+                                     epilog=EXAMPLES, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sql', nargs='?', help="query to run; without it an interactive prompt starts")
+    parser.add_argument('--csv', default=None, help="also write the result to this CSV file")
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--balancing-dir', default=BALANCING_DIR)
+    args = parser.parse_args()
+
+    con = connect(args.store_dir, args.balancing_dir)
+    if args.sql:
+        run_and_print(con, args.sql, args.csv)
+    else:
+        print(f"Views: {', '.join(list_views(con)) or '(none, run entsoe_store.py --import first)'}")
+        print(EXAMPLES)
+        while True:
+            try:
+                sql = input('sql> ').strip()
+            except (EOFError, KeyboardInterrupt):
+                break
+            if sql.lower() in ('exit', 'quit', '\\q'):
+                break
+            if sql:
+                try:
+                    run_and_print(con, sql)
+                except duckdb.Error as e:
+                    print(f"Error: {e}")
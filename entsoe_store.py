@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Partitioned Parquet store for all price series (replaces the per-year and outfile_* CSVs).
+
+Layout: data/store/{dataset}/zone={zone}/year={YYYY}/month={MM}/part.parquet
+(year and month in UTC). Every file holds an int64 'timestamp' column (UTC
+epoch seconds), one float32 column per price, e.g. DA_price or Long/Short,
+and a float32 'hours' column with the time each row covers (1 for PT60M,
+0.25 for PT15M; entsoe_align.duration_hours over the partition), written on
+every write and compaction so SQL can weight prices without recomputing it.
+read_store() leaves 'hours' out unless it is asked for. read_store() only opens the partitions that overlap the requested time range
+and only the requested columns, so seven years of hourly DA plus 15-min
+imbalance load in milliseconds instead of a pass of CSV text parsing.
+
+Small, frequent updates go through the ingest log instead:
+data/store/{dataset}/_log/zone={zone}/{sequence}.parquet holds one record
+batch per fetched chunk, so appending costs I/O for the new rows only.
+read_store() overlays the log on the partitions (newest write wins) and
+compact() merges it into the monthly partitions, sorted and deduplicated,
+keeping the last write of every timestamp (ENTSO-E revisions replace the
+earlier values).
+
+Every dataset/zone keeps a manifest (zone={zone}/_manifest.json) with the
+covered UTC intervals, resolution runs (PT60M, PT15M, ...), row count, sha256
+checksum and last fetch time of each partition, updated on every write.
+coverage() / find_gaps() answer "is 2024 complete?" or "which periods
+between A and B are missing?" from the manifest alone, without loading or
+counting rows, and store_resolutions() tells where a zone switched from
+hourly to 15-min DA. Resolution is never assumed per dataset: it is read
+from the spacing of the stored timestamps, so a history that mixes PT60M
+and PT15M is one series, and a missing quarter-hour is a gap as well.
+
+Usage:
+    from entsoe_store import write_store, read_store, append_log, compact
+    write_store(DA, 'DA', 'NL')
+    append_log(DA_chunk, 'DA', 'NL')    # e.g. from fetch_chunked(on_chunk=...)
+    compact('DA', 'NL')
+    DA = read_store('DA', 'NL', start='2024-01-01', end='2025-01-01')
+    find_gaps('DA', 'NL', '2024-01-01', '2025-01-01')   # [] when complete
+
+    python entsoe_store.py --import     # one-off migration of data/*.csv and outfile_*.csv
+    python entsoe_store.py --compact
+    python entsoe_store.py --info
+    python entsoe_store.py --gaps 2024-01-01 2025-01-01 --dataset imbalance
+    python entsoe_store.py --verify
+    python entsoe_store.py --resolutions --dataset DA --zone NL
+    python entsoe_store.py --add-hours  # add the hours column to partitions written before it existed
+@author: Mayk Thewessen
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from entsoe_align import describe_resolutions, duration_hours, resolution_runs, run_steps, to_epoch_seconds, to_index
+from entsoe_load import read_price_csv
+
+
+STORE_DIR = os.path.join('data', 'store')
+PRICE_DTYPE = np.float32
+DEFAULT_TZ = 'Europe/Amsterdam'
+LOG_DIR_NAME = '_log'
+MANIFEST_NAME = '_manifest.json'
+HOURS_COLUMN = 'hours'
+# Spacing assumed for a partition with a single row (otherwise its most common spacing is used)
+DATASET_STEPS = {'DA': 3600, 'imbalance': 900}
+
+
+#%% Conversion
+
+def to_columns(data):
+    """Series / DataFrame with a DatetimeIndex -> dict of numpy columns in store types."""
+    if isinstance(data, pd.Series):
+        data = data.to_frame(data.name if data.name is not None else 'price')
+    columns = {'timestamp': to_epoch_seconds(data.index)}
+    for name in data.columns:
+        columns[str(name)] = data[name].to_numpy(dtype=PRICE_DTYPE, na_value=np.nan)
+    return columns
+
+
+#%% Writing
+
+def partition_dir(dataset, zone, year, month, store_dir=STORE_DIR):
+    return os.path.join(store_dir, dataset, f'zone={zone}', f'year={year}', f'month={month:02d}')
+
+
+def _merge(old, new):
+    # Last write wins: rows of `new` replace stored rows with the same timestamp
+    table = pa.concat_tables([old, new], promote_options='permissive')
+    timestamps = table.column('timestamp').to_numpy()
+    order = np.argsort(timestamps, kind='stable')
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = timestamps[order][1:] != timestamps[order][:-1]
+    return table.take(pa.array(order[keep]))
+
+
+def _with_hours(table):
+    # (Re)compute the hours column from the partition's sorted timestamps
+    if HOURS_COLUMN in table.column_names:
+        table = table.drop_columns([HOURS_COLUMN])
+    hours = duration_hours(to_index(table.column('timestamp').to_numpy(), 'UTC'))
+    return table.append_column(HOURS_COLUMN, pa.array(hours, type=pa.float32()))
+
+
+def _write_partitions(columns, dataset, zone, store_dir=STORE_DIR):
+    # columns: dict of numpy arrays in store types, in write order (later rows win)
+    timestamps = columns['timestamp']
+    months = timestamps.astype('datetime64[s]').astype('datetime64[M]')
+    entries = {}
+    for month in np.unique(months):
+        mask = months == month
+        table = pa.table({name: values[mask] for name, values in columns.items()})
+        year, month_number = int(str(month)[:4]), int(str(month)[5:7])
+        directory = partition_dir(dataset, zone, year, month_number, store_dir)
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, 'part.parquet')
+        if os.path.exists(file_path):
+            table = _merge(pq.read_table(file_path), table)
+        else:
+            table = _merge(table.slice(0, 0), table)
+        table = _with_hours(table)
+        pq.write_table(table, file_path + '.tmp', compression='zstd')
+        os.replace(file_path + '.tmp', file_path)
+        entries[f'{year}-{month_number:02d}'] = _manifest_entry(file_path, table.column('timestamp').to_numpy(),
+                                                                 DATASET_STEPS.get(dataset))
+    _update_manifest(dataset, zone, entries, store_dir)
+    return len(timestamps)
+
+
+def write_store(data, dataset, zone, store_dir=STORE_DIR):
+    """Write a Series / DataFrame (DatetimeIndex, price columns) into the monthly partitions of dataset/zone.
+
+    Existing rows with the same timestamp are replaced. Returns the number of rows written.
+    """
+    columns = to_columns(data)
+    if len(columns['timestamp']) == 0:
+        return 0
+    return _write_partitions(columns, dataset, zone, store_dir)
+
+
+#%% Ingest log
+
+def log_dir(dataset, zone, store_dir=STORE_DIR):
+    return os.path.join(store_dir, dataset, LOG_DIR_NAME, f'zone={zone}')
+
+
+def log_files(dataset, zone, store_dir=STORE_DIR):
+    """Log batches of dataset/zone in write order (the file names sort by sequence)."""
+    return sorted(glob.glob(os.path.join(log_dir(dataset, zone, store_dir), '*.parquet')))
+
+
+def log_zones(dataset, store_dir=STORE_DIR):
+    directory = os.path.join(store_dir, dataset, LOG_DIR_NAME)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(d.split('=', 1)[1] for d in os.listdir(directory) if d.startswith('zone='))
+
+
+def append_log(data, dataset, zone, store_dir=STORE_DIR):
+    """Append one record batch (a fetched chunk) to the ingest log of dataset/zone.
+
+    Only the new rows are written; nothing existing is read or rewritten.
+    Returns the number of rows appended.
+    """
+    columns = to_columns(data)
+    if len(columns['timestamp']) == 0:
+        return 0
+    directory = log_dir(dataset, zone, store_dir)
+    os.makedirs(directory, exist_ok=True)
+    # Nanosecond clock first, so name order is write order; pid and thread keep parallel writers apart
+    file_path = os.path.join(directory, f'{time.time_ns():020d}_{os.getpid()}_{threading.get_ident()}.parquet')
+    pq.write_table(pa.table(columns), file_path + '.tmp', compression='zstd')
+    os.replace(file_path + '.tmp', file_path)
+    return len(columns['timestamp'])
+
+
+def compact(dataset, zones=None, store_dir=STORE_DIR):
+    """Merge the ingest log of dataset into its monthly partitions and remove the merged batches.
+
+    Batches are applied in write order, so the last write of a timestamp wins.
+    Only the months present in the log are rewritten. A crash before the
+    batches are removed only means they are merged again next time.
+    Returns {zone: rows merged}.
+    """
+    if zones is None:
+        zones = log_zones(dataset, store_dir)
+    elif isinstance(zones, str):
+        zones = [zones]
+    merged = {}
+    for zone in zones:
+        files = log_files(dataset, zone, store_dir)
+        if not files:
+            continue
+        table = pa.concat_tables([pq.read_table(f) for f in files], promote_options='permissive')
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+        merged[zone] = _write_partitions(columns, dataset, zone, store_dir)
+        for file_path in files:
+            os.remove(file_path)
+        print(f"Compacted {len(files)} log batches ({merged[zone]} rows) into {dataset}/zone={zone}")
+    return merged
+
+
+#%% Reading
+
+def _utc_month(value):
+    return pd.Timestamp(value).tz_convert('UTC').tz_localize(None).to_period('M')
+
+
+def _zones(dataset, store_dir=STORE_DIR):
+    return sorted(d.split('=', 1)[1] for d in os.listdir(os.path.join(store_dir, dataset)) if d.startswith('zone='))
+
+
+def list_partitions(dataset, zones=None, start=None, end=None, store_dir=STORE_DIR):
+    """Partition files of dataset for the zones that overlap [start, end)."""
+    if zones is None:
+        zones = _zones(dataset, store_dir)
+    elif isinstance(zones, str):
+        zones = [zones]
+    first = _utc_month(start) if start is not None else None
+    last = _utc_month(end - pd.Timedelta(seconds=1)) if end is not None else None
+    paths = []
+    for zone in zones:
+        for file_path in sorted(glob.glob(os.path.join(store_dir, dataset, f'zone={zone}', 'year=*', 'month=*', 'part.parquet'))):
+            year, month = map(int, re.findall(r'(?:year|month)=(\d+)', file_path)[-2:])
+            period = pd.Period(year=year, month=month, freq='M')
+            if (first is None or period >= first) and (last is None or period <= last):
+                paths.append((zone, file_path))
+    return paths
+
+
+def _as_timestamp(value, tz):
+    value = pd.Timestamp(value)
+    return value.tz_localize(tz) if value.tz is None else value
+
+
+def read_store(dataset, zones=None, start=None, end=None, columns=None, tz=DEFAULT_TZ,
+               store_dir=STORE_DIR, as_arrays=False, include_log=True):
+    """Read [start, end) of dataset for one or more zones.
+
+    Only partitions overlapping the range and only `columns` (default: all)
+    are read. Returns a DataFrame indexed by time in tz (with a 'zone' column
+    when several zones are read), or with as_arrays=True a dict of numpy
+    arrays (int64 'timestamp' in UTC epoch seconds, float32 prices, 'zone').
+    Naive start/end are taken in tz. Rows still in the ingest log are
+    included (newest write wins) unless include_log=False. The stored 'hours'
+    column is only returned when it is listed in `columns`.
+    """
+    start = _as_timestamp(start, tz) if start is not None else None
+    end = _as_timestamp(end, tz) if end is not None else None
+    if zones is None:
+        zones = _zones(dataset, store_dir)
+        if include_log:
+            zones = sorted(set(zones) | set(log_zones(dataset, store_dir)))
+    elif isinstance(zones, str):
+        zones = [zones]
+    paths = list_partitions(dataset, zones, start, end, store_dir)
+
+    row_filter = None
+    if start is not None:
+        row_filter = ds.field('timestamp') >= int(start.timestamp())
+    if end is not None:
+        end_filter = ds.field('timestamp') < int(end.timestamp())
+        row_filter = end_filter if row_filter is None else row_filter & end_filter
+    read_columns = None if columns is None else ['timestamp'] + [c for c in columns if c != 'timestamp']
+    with_hours = read_columns is not None and HOURS_COLUMN in read_columns
+
+    def read(files):
+        dataset_files = ds.dataset(files, format='parquet')
+        names = read_columns or [n for n in dataset_files.schema.names if n != HOURS_COLUMN]
+        # Log batches and partitions written before the column existed have no hours
+        names = [n for n in names if n != HOURS_COLUMN or n in dataset_files.schema.names]
+        return dataset_files.to_table(columns=names, filter=row_filter)
+
+    tables, zone_labels = [], []
+    for zone in zones:
+        files = [p for z, p in paths if z == zone]
+        parts = [read(files)] if files else []
+        pending = log_files(dataset, zone, store_dir) if include_log else []
+        if pending:
+            # Not yet compacted: overlay the log on the partitions, later writes win
+            log_table = read(pending)
+            parts = [_merge(parts[0] if parts else log_table.slice(0, 0), log_table)]
+        if not parts:
+            continue
+        if with_hours and (HOURS_COLUMN not in parts[0].column_names or parts[0].column(HOURS_COLUMN).null_count):
+            parts = [_with_hours(parts[0])]
+        tables.append(parts[0])
+        zone_labels.append(np.full(parts[0].num_rows, zone, dtype=object))
+    if not tables:
+        return {} if as_arrays else pd.DataFrame()
+    table = pa.concat_tables(tables, promote_options='permissive')
+    arrays = {name: table.column(name).to_numpy() for name in table.column_names}
+    multi_zone = len(tables) > 1
+    if multi_zone or as_arrays:
+        arrays['zone'] = np.concatenate(zone_labels)
+    if as_arrays:
+        return arrays
+
+    index = to_index(arrays.pop('timestamp'), tz)
+    df = pd.DataFrame(arrays, index=index)
+    if multi_zone:
+        df['zone'] = df['zone'].astype('category')
+    return df
+
+
+def store_info(store_dir=STORE_DIR):
+    """One row per dataset/zone with the number of partitions, rows and not yet compacted log batches."""
+    rows = []
+    for dataset in sorted(os.listdir(store_dir)) if os.path.isdir(store_dir) else []:
+        for zone, file_path in list_partitions(dataset, store_dir=store_dir):
+            metadata = pq.read_metadata(file_path)
+            rows.append({'dataset': dataset, 'zone': zone, 'file': file_path, 'rows': metadata.num_rows, 'log': 0})
+        for zone in log_zones(dataset, store_dir):
+            for file_path in log_files(dataset, zone, store_dir):
+                rows.append({'dataset': dataset, 'zone': zone, 'file': None, 'rows': 0, 'log': 1})
+    if not rows:
+        return pd.DataFrame()
+    info = pd.DataFrame(rows).groupby(['dataset', 'zone']).agg(partitions=('file', 'count'), rows=('rows', 'sum'),
+                                                               log_batches=('log', 'sum'))
+    return info.reset_index()
+
+
+#%% Coverage manifest
+
+def coverage_intervals(timestamps, step=None):
+    """Covered [start, end) runs (UTC epoch seconds) of sorted timestamps.
+
+    A run breaks where the spacing exceeds the step of the resolution run it
+    lies in (see resolution_runs), so hourly and 15-min rows are judged each
+    by their own spacing; every row covers its step. Returns (n x 2 int64
+    array, most common spacing, or step for a single row).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) == 0:
+        return np.empty((0, 2), dtype=np.int64), step
+    diffs = np.diff(timestamps)
+    if len(diffs):
+        values, counts = np.unique(diffs, return_counts=True)
+        step = int(values[counts.argmax()])
+    step = step or 3600
+    steps = run_steps(timestamps, resolution_runs(timestamps, step))
+    breaks = np.flatnonzero(diffs > steps[:-1])
+    firsts = np.r_[0, breaks + 1]
+    lasts = np.r_[breaks, len(timestamps) - 1]
+    return np.column_stack([timestamps[firsts], timestamps[lasts] + steps[lasts]]), step
+
+
+def _epoch(value, tz=DEFAULT_TZ):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(_as_timestamp(value, tz).timestamp())
+
+
+class CoverageIndex:
+    """Sorted, merged, disjoint [start, end) intervals in UTC epoch seconds with O(log n) lookups.
+
+    Because the intervals never overlap, two sorted arrays and a binary search
+    answer the same questions as an interval tree: contains(t), overlaps and
+    the gaps between A and B, touching only the intervals inside [A, B).
+    Timestamps are epoch seconds or anything pd.Timestamp accepts (naive = tz).
+    """
+
+    def __init__(self, intervals=(), tz=DEFAULT_TZ):
+        intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+        intervals = intervals[np.argsort(intervals[:, 0], kind='stable')]
+        starts, ends = [], []
+        for start, end in intervals:
+            if starts and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        self.tz = tz
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __repr__(self):
+        return f'CoverageIndex({len(self)} intervals)'
+
+    def contains(self, timestamp):
+        i = np.searchsorted(self.starts, _epoch(timestamp, self.tz), side='right') - 1
+        return bool(i >= 0 and _epoch(timestamp, self.tz) < self.ends[i])
+
+    def _between(self, start, end):
+        start, end = _epoch(start, self.tz), _epoch(end, self.tz)
+        first = np.searchsorted(self.ends, start, side='right')   # first interval ending after start
+        last = np.searchsorted(self.starts, end, side='left')     # intervals starting before end
+        return start, end, first, last
+
+    def covered(self, start, end):
+        """Covered parts of [start, end) as a list of (start, end) epoch pairs."""
+        start, end, first, last = self._between(start, end)
+        return [(max(int(self.starts[i]), start), min(int(self.ends[i]), end)) for i in range(first, last)]
+
+    def gaps(self, start, end):
+        """Uncovered parts of [start, end) as a list of (start, end) epoch pairs."""
+        start, end, first, last = self._between(start, end)
+        gaps, cursor = [], start
+        for i in range(first, last):
+            if self.starts[i] > cursor:
+                gaps.append((cursor, int(self.starts[i])))
+            cursor = max(cursor, int(self.ends[i]))
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def is_complete(self, start, end):
+        return not self.gaps(start, end)
+
+
+def manifest_path(dataset, zone, store_dir=STORE_DIR):
+    return os.path.join(store_dir, dataset, f'zone={zone}', MANIFEST_NAME)
+
+
+def _file_checksum(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest_entry(file_path, timestamps, step=None, fetched_at=None):
+    intervals, step = coverage_intervals(timestamps, step)
+    return {
+        'rows': int(len(timestamps)),
+        'step': step,
+        'resolutions': resolution_runs(timestamps, step),
+        'intervals': intervals.tolist(),
+        'sha256': _file_checksum(file_path),
+        'fetched_at': fetched_at or pd.Timestamp.now(tz='UTC').isoformat(timespec='seconds'),
+    }
+
+
+def load_manifest(dataset, zone, store_dir=STORE_DIR):
+    """{'partitions': {'YYYY-MM': {rows, step, resolutions, intervals, sha256, fetched_at}}} of dataset/zone."""
+    file_path = manifest_path(dataset, zone, store_dir)
+    if not os.path.exists(file_path):
+        return {'partitions': {}}
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, dataset, zone, store_dir=STORE_DIR):
+    file_path = manifest_path(dataset, zone, store_dir)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(file_path + '.tmp', file_path)
+
+
+def _update_manifest(dataset, zone, entries, store_dir=STORE_DIR):
+    manifest = load_manifest(dataset, zone, store_dir)
+    manifest['partitions'].update(entries)
+    _save_manifest(manifest, dataset, zone, store_dir)
+
+
+def rebuild_manifest(dataset, zone, store_dir=STORE_DIR):
+    """Recompute the manifest of dataset/zone from its partition files (fetched_at = file modification time)."""
+    entries = {}
+    for _, file_path in list_partitions(dataset, zone, store_dir=store_dir):
+        year, month = map(int, re.findall(r'(?:year|month)=(\d+)', file_path)[-2:])
+        timestamps = pq.read_table(file_path, columns=['timestamp']).column('timestamp').to_numpy()
+        modified = pd.Timestamp(os.path.getmtime(file_path), unit='s', tz='UTC').isoformat(timespec='seconds')
+        entries[f'{year}-{month:02d}'] = _manifest_entry(file_path, timestamps, DATASET_STEPS.get(dataset), modified)
+    manifest = {'partitions': entries}
+    _save_manifest(manifest, dataset, zone, store_dir)
+    return manifest
+
+
+def verify_manifest(dataset, zone, store_dir=STORE_DIR):
+    """Partitions whose file is missing, unlisted or differs from its manifest checksum."""
+    listed = load_manifest(dataset, zone, store_dir)['partitions']
+    on_disk = {}
+    for _, file_path in list_partitions(dataset, zone, store_dir=store_dir):
+        year, month = map(int, re.findall(r'(?:year|month)=(\d+)', file_path)[-2:])
+        on_disk[f'{year}-{month:02d}'] = file_path
+    bad = sorted(set(listed) ^ set(on_disk))
+    bad += [key for key in sorted(set(listed) & set(on_disk)) if _file_checksum(on_disk[key]) != listed[key]['sha256']]
+    return sorted(bad)
+
+
+def coverage(dataset, zone, store_dir=STORE_DIR, include_log=True, tz=DEFAULT_TZ):
+    """CoverageIndex of dataset/zone from the manifest (built on first use), plus uncompacted log batches."""
+    file_path = manifest_path(dataset, zone, store_dir)
+    if os.path.exists(file_path):
+        manifest = load_manifest(dataset, zone, store_dir)
+    elif os.path.isdir(os.path.dirname(file_path)):
+        manifest = rebuild_manifest(dataset, zone, store_dir)
+    else:
+        manifest = {'partitions': {}}
+    intervals = [interval for entry in manifest['partitions'].values() for interval in entry['intervals']]
+    if include_log:
+        for log_file in log_files(dataset, zone, store_dir):
+            timestamps = np.sort(pq.read_table(log_file, columns=['timestamp']).column('timestamp').to_numpy())
+            intervals.extend(coverage_intervals(timestamps, DATASET_STEPS.get(dataset))[0].tolist())
+    return CoverageIndex(intervals, tz)
+
+
+def store_resolutions(dataset, zone, store_dir=STORE_DIR):
+    """[start, end, step] resolution runs of dataset/zone over all partitions, from the manifest.
+
+    Manifests written before resolutions were recorded are rebuilt once.
+    """
+    file_path = manifest_path(dataset, zone, store_dir)
+    manifest = load_manifest(dataset, zone, store_dir)
+    stale = any('resolutions' not in entry for entry in manifest['partitions'].values())
+    if (stale or not os.path.exists(file_path)) and os.path.isdir(os.path.dirname(file_path)):
+        manifest = rebuild_manifest(dataset, zone, store_dir)
+    runs = []
+    for key in sorted(manifest['partitions']):
+        for start, end, step in manifest['partitions'][key]['resolutions']:
+            if runs and runs[-1][2] == step:
+                runs[-1][1] = end
+            else:
+                if runs:
+                    runs[-1][1] = min(runs[-1][1], start)
+                runs.append([start, end, step])
+    return runs
+
+
+def find_gaps(dataset, zone, start, end, store_dir=STORE_DIR, tz=DEFAULT_TZ):
+    """Missing [start, end) periods of dataset/zone as (start, end) Timestamps in tz, without reading any data."""
+    gaps = coverage(dataset, zone, store_dir, tz=tz).gaps(start, end)
+    return [(pd.Timestamp(a, unit='s', tz='UTC').tz_convert(tz), pd.Timestamp(b, unit='s', tz='UTC').tz_convert(tz))
+            for a, b in gaps]
+
+
+#%% Migration of the old CSV files
+
+def import_legacy_csvs(root='.', store_dir=STORE_DIR, zone='NL'):
+    """Load data/DA_prices_{year}.csv and the outfile_* CSVs into the store.
+
+    Overlapping files are imported oldest range first, so the file covering
+    the latest range wins; data/DA_prices_{year}.csv (the maintained files) go last.
+    """
+    def end_date(file_path):
+        return re.search(r'_to_(\d{8})', file_path).group(1)
+
+    imported = {}
+    for file_path in sorted(glob.glob(os.path.join(root, 'outfile_df_*_to_*.csv')), key=end_date):
+        df = read_price_csv(file_path, 'time')
+        imported[file_path] = write_store(df[['DA_price']], 'DA', os.path.basename(file_path).split('_')[-4], store_dir)
+    for file_path in sorted(glob.glob(os.path.join(root, 'outfile_DA_60min_*_to_*.csv')), key=end_date):
+        df = read_price_csv(file_path, 'datetime')
+        imported[file_path] = write_store(df[['DA_price']], 'DA', os.path.basename(file_path).split('_')[-4], store_dir)
+    for file_path in sorted(glob.glob(os.path.join(root, 'data', 'DA_prices_[0-9][0-9][0-9][0-9].csv'))):
+        df = read_price_csv(file_path, 'time')
+        imported[file_path] = write_store(df[['DA_price']], 'DA', zone, store_dir)
+    for file_path in sorted(glob.glob(os.path.join(root, 'outfile_imb_15min_*_to_*.csv')), key=end_date):
+        df = read_price_csv(file_path)  # unnamed first column
+        # the DA_price column is the forward-filled DA series, which is kept in the DA dataset
+        imported[file_path] = write_store(df[['Long', 'Short']], 'imbalance', os.path.basename(file_path).split('_')[-4], store_dir)
+    for file_path, rows in imported.items():
+        print(f"Imported {rows} rows from {file_path}")
+    return imported
+
+
+def add_hours(dataset, zone, store_dir=STORE_DIR):
+    """Add the hours column to the partitions of dataset/zone written before it existed.
+
+    The manifest checksums are updated; fetched_at is kept. Returns the number of partitions rewritten.
+    """
+    manifest = load_manifest(dataset, zone, store_dir)['partitions']
+    entries = {}
+    for _, file_path in list_partitions(dataset, zone, store_dir=store_dir):
+        if HOURS_COLUMN in pq.read_schema(file_path).names:
+            continue
+        year, month = map(int, re.findall(r'(?:year|month)=(\d+)', file_path)[-2:])
+        table = _with_hours(pq.read_table(file_path))
+        pq.write_table(table, file_path + '.tmp', compression='zstd')
+        os.replace(file_path + '.tmp', file_path)
+        key = f'{year}-{month:02d}'
+        entries[key] = _manifest_entry(file_path, table.column('timestamp').to_numpy(), DATASET_STEPS.get(dataset),
+                                       manifest.get(key, {}).get('fetched_at'))
+    if entries:
+        _update_manifest(dataset, zone, entries, store_dir)
+    return len(entries)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Partitioned Parquet store for ENTSO-E price series")
+    parser.add_argument('--import', dest='do_import', action='store_true',
+                        help="import data/DA_prices_*.csv and outfile_*.csv into the store")
+    parser.add_argument('--compact', action='store_true', help="merge the ingest logs of all datasets into the partitions")
+    parser.add_argument('--info', action='store_true', help="list datasets, zones, partitions and rows")
+    parser.add_argument('--gaps', nargs=2, metavar=('START', 'END'), help="list missing periods of --dataset/--zone")
+    parser.add_argument('--verify', action='store_true', help="check the partition files against their manifests")
+    parser.add_argument('--rebuild-manifest', action='store_true', help="recompute all manifests from the partition files")
+    parser.add_argument('--resolutions', action='store_true', help="list the resolution runs of --dataset/--zone")
+    parser.add_argument('--add-hours', action='store_true',
+                        help="add the hours column to partitions written before it existed")
+    parser.add_argument('--dataset', default='DA')
+    parser.add_argument('--zone', default='NL')
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    args = parser.parse_args()
+
+    if args.do_import:
+        import_legacy_csvs(store_dir=args.store_dir)
+    if args.compact and os.path.isdir(args.store_dir):
+        for dataset in sorted(os.listdir(args.store_dir)):
+            compact(dataset, store_dir=args.store_dir)
+    datasets = sorted(os.listdir(args.store_dir)) if os.path.isdir(args.store_dir) else []
+    if args.add_hours:
+        for dataset in datasets:
+            for zone in _zones(dataset, args.store_dir):
+                print(f"Added hours to {add_hours(dataset, zone, args.store_dir)} partitions of {dataset}/zone={zone}")
+    if args.rebuild_manifest or args.verify:
+        for dataset in datasets:
+            for zone in _zones(dataset, args.store_dir):
+                if args.rebuild_manifest:
+                    rebuild_manifest(dataset, zone, args.store_dir)
+                    print(f"Rebuilt manifest of {dataset}/zone={zone}")
+                if args.verify:
+                    bad = verify_manifest(dataset, zone, args.store_dir)
+                    print(f"{dataset}/zone={zone}: " + (f"mismatch in {', '.join(bad)}" if bad else "OK"))
+    if args.gaps:
+        gaps = find_gaps(args.dataset, args.zone, *args.gaps, store_dir=args.store_dir)
+        for gap_start, gap_end in gaps:
+            print(f"Missing {gap_start} to {gap_end}")
+        print(f"{len(gaps)} gaps in {args.dataset} {args.zone} between {args.gaps[0]} and {args.gaps[1]}")
+    if args.resolutions:
+        for start, end, step in store_resolutions(args.dataset, args.zone, args.store_dir):
+            print(describe_resolutions([[start, end, step]]))
+    if args.info or not (args.do_import or args.compact or args.gaps or args.verify or args.rebuild_manifest
+                         or args.resolutions or args.add_hours):
+        print(store_info(args.store_dir).to_string(index=False))
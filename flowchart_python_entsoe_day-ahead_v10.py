@@ -2,6 +2,7 @@ import os
 import pandas as pd
 import plotly.express as px
 from entsoe import EntsoePandasClient
+from entsoe_load import read_price_csv
 
 # Setup Environment
 os.system('clear')  # Clear console (Linux/MacOS)
@@ -16,7 +17,7 @@ os.makedirs(DATA_DIR, exist_ok=True)
 def fetch_data(year):
     file_path = os.path.join(DATA_DIR, f"prices_{year}.csv")
     if os.path.exists(file_path):
-        return pd.read_csv(file_path, index_col=0, parse_dates=True)
+        return read_price_csv(file_path)
     
     start = pd.Timestamp(f"{year}-01-01", tz="UTC")
     end = pd.Timestamp(f"{year}-12-31", tz="UTC")
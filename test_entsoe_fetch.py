@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regression tests for the chunked fetch against the in-process mock ENTSO-E server (entsoe_mock).
+
+Usage:
+    python -m pytest -q test_entsoe_fetch.py
+@author: Mayk Thewessen
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import entsoe.entsoe
+from entsoe_clients import set_endpoint_url
+from entsoe_fetch import get_da_prices_chunked
+from entsoe_mock import MockEntsoeServer, make_bench_client
+
+
+@pytest.fixture(scope='module')
+def client():
+    old_env, old_url = os.environ.get('ENTSOE_ENDPOINT_URL'), entsoe.entsoe.URL
+    server = MockEntsoeServer().start()
+    set_endpoint_url(server.url)
+    yield make_bench_client()
+    server.stop()
+    entsoe.entsoe.URL = old_url
+    if old_env is None:
+        os.environ.pop('ENTSOE_ENDPOINT_URL', None)
+    else:
+        os.environ['ENTSOE_ENDPOINT_URL'] = old_env
+
+
+@pytest.mark.parametrize('fast_parse', [False, True])
+def test_da_chunks_come_back_unique_and_before_end(client, tmp_path, fast_parse):
+    # Hourly September, 15-min October (SDAC go-live) with the 25-hour DST day, in 20-day chunks
+    start = pd.Timestamp('2025-09-01', tz='Europe/Brussels')
+    end = pd.Timestamp('2025-11-01', tz='Europe/Brussels')
+    DA, failed = get_da_prices_chunked(client, 'NL', start, end, chunk_size=pd.Timedelta(days=20), max_workers=2,
+                                       planner=None, fast_parse=fast_parse, return_failed=True,
+                                       failed_ledger_path=str(tmp_path / 'failed_chunks.json'))
+
+    assert failed == []
+    assert DA.index.is_unique and DA.index.is_monotonic_increasing
+    assert DA.index[0] == start and DA.index[-1] < end
+    assert len(DA) == 30 * 24 + (31 * 24 + 1) * 4
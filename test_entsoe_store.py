@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the resolution runs, coverage and stored hours of entsoe_store around the 15-min DA go-live.
+
+Usage:
+    python -m pytest -q test_entsoe_store.py
+@author: Mayk Thewessen
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from entsoe_align import duration_hours
+from entsoe_store import append_log, compact, coverage_intervals, resolution_runs, write_store
+
+
+HOUR, QUARTER = 3600, 900
+
+
+@pytest.mark.parametrize('hours', [1, 2, 3, 24])
+def test_hourly_rows_followed_by_15min_rows(hours):
+    switch = hours * HOUR
+    timestamps = np.r_[np.arange(hours) * HOUR, switch + np.arange(96) * QUARTER]
+
+    assert resolution_runs(timestamps) == [[0, switch, HOUR], [switch, switch + 96 * QUARTER, QUARTER]]
+    # Every hourly row covers its full hour: no false 45-min gaps before the switch
+    assert coverage_intervals(timestamps)[0].tolist() == [[0, switch + 96 * QUARTER]]
+
+
+def test_short_hourly_tail_after_a_gap_keeps_its_hour():
+    timestamps = np.r_[np.arange(24) * HOUR, 30 * HOUR, 31 * HOUR + np.arange(8) * QUARTER]
+
+    assert resolution_runs(timestamps) == [[0, 31 * HOUR, HOUR], [31 * HOUR, 33 * HOUR, QUARTER]]
+    assert coverage_intervals(timestamps)[0].tolist() == [[0, 24 * HOUR], [30 * HOUR, 33 * HOUR]]
+
+
+def test_isolated_hourly_rows_keep_the_hourly_step():
+    timestamps = np.array([0, 1, 3, 5, 6, 7, 8]) * HOUR
+
+    assert resolution_runs(timestamps) == [[0, 9 * HOUR, HOUR]]
+    assert coverage_intervals(timestamps)[0].tolist() == [[0, 2 * HOUR], [3 * HOUR, 4 * HOUR], [5 * HOUR, 9 * HOUR]]
+
+
+def test_missing_quarter_hour_is_a_gap():
+    timestamps = np.delete(np.arange(96) * QUARTER, 10)
+
+    assert resolution_runs(timestamps) == [[0, 96 * QUARTER, QUARTER]]
+    assert coverage_intervals(timestamps)[0].tolist() == [[0, 10 * QUARTER], [11 * QUARTER, 96 * QUARTER]]
+
+
+def test_sql_hours_match_duration_hours(tmp_path):
+    pytest.importorskip('duckdb')
+    from entsoe_sql import connect
+
+    # Last hourly days before the go-live, a missing hour, then 15-min rows with a missing quarter
+    index = pd.date_range('2025-09-29 22:00', '2025-09-30 22:00', freq='h', inclusive='left', tz='UTC')
+    index = index.delete(5).append(pd.date_range('2025-09-30 22:00', periods=96, freq='15min', tz='UTC').delete(10))
+    DA = pd.Series(np.arange(len(index), dtype=np.float32), index=index, name='DA_price')
+    write_store(DA[:30], 'DA', 'NL', str(tmp_path))
+    append_log(DA[30:], 'DA', 'NL', str(tmp_path))
+    compact('DA', 'NL', str(tmp_path))
+
+    con = connect(str(tmp_path), balancing_dir=str(tmp_path))
+    hours = con.execute("SELECT hours FROM da ORDER BY timestamp").fetchnumpy()['hours']
+    np.testing.assert_array_equal(hours, duration_hours(index))
+    assert hours.sum() == 23 + 95 * 0.25